@@ -11,6 +11,7 @@ import os
 import csv
 import boto3
 import psycopg2
+from psycopg2.extras import execute_values
 
 # Initialize the S3 client
 s3 = boto3.client('s3')
@@ -45,27 +46,43 @@ def lambda_handler(event, context):
     next(csv_reader) # Skip the header row
     
     # If new data has been pushed to the 'stock-info' folder in the S3 bucket, 
-    # then insert data into the 'company_info' table in the database
+    # then upsert data into the 'company_info' table in the database
     if 'stock-info' in key:
-        for row in csv_reader:
-            # Construct the SQL INSERT statement for the 'company_info' table
-            insert_query = 'INSERT INTO company_info (ticker, company_name, exchange, ceo, sector, industry, market_cap) VALUES (%s, %s, %s, %s, %s, %s, %s)'
-            
-            # Execute the INSERT statement with the current row data
-            cursor.execute(insert_query, row)
+        # Construct the SQL upsert statement for the 'company_info' table
+        upsert_query = """
+            INSERT INTO company_info (ticker, company_name, exchange, ceo, sector, industry, market_cap) VALUES %s
+            ON CONFLICT (ticker) DO UPDATE SET 
+                company_name = EXCLUDED.company_name, exchange = EXCLUDED.exchange, ceo = EXCLUDED.ceo, 
+                sector = EXCLUDED.sector, industry = EXCLUDED.industry, market_cap = EXCLUDED.market_cap, 
+                ingested_at = CURRENT_TIMESTAMP
+        """
+        
+        # Execute the upsert statement for all rows at once (last row wins for a repeated ticker)
+        rows = list({row[0]: row for row in csv_reader}.values())
+        execute_values(cursor, upsert_query, rows, page_size=1000)
     else:
         print('This event does not contain data for the company_info table.')
             
       
     # If new data has been pushed to the 'stock-price' folder in the S3 bucket,     
-    # then insert data into the 'daily_stock_price' table in the database
+    # then upsert data into the 'daily_stock_price' table in the database
     if 'stock-price' in key:
-        for row in csv_reader:
-            # Construct the SQL INSERT statement for the 'daily_stock_info' table
-            insert_query = 'INSERT INTO daily_stock_data (date, ticker, open, high, low, close, volume) VALUES (%s, %s, %s, %s, %s, %s, %s)'
-            
-            # Execute the INSERT statement with the current row data
-            cursor.execute(insert_query, row)
+        # Construct the SQL upsert statement for the 'daily_stock_info' table. The (ticker, date) 
+        # primary key finds existing rows; they are only rewritten (and marked as newly ingested 
+        # for the incremental dbt models) when their prices actually changed.
+        upsert_query = """
+            INSERT INTO daily_stock_data (date, ticker, open, high, low, close, volume) VALUES %s
+            ON CONFLICT (ticker, date) DO UPDATE SET 
+                open = EXCLUDED.open, high = EXCLUDED.high, low = EXCLUDED.low, close = EXCLUDED.close, 
+                volume = EXCLUDED.volume, ingested_at = CURRENT_TIMESTAMP
+            WHERE (daily_stock_data.open, daily_stock_data.high, daily_stock_data.low, 
+                   daily_stock_data.close, daily_stock_data.volume) 
+                  IS DISTINCT FROM (EXCLUDED.open, EXCLUDED.high, EXCLUDED.low, EXCLUDED.close, EXCLUDED.volume)
+        """
+        
+        # Execute the upsert statement for all rows at once (last row wins for a repeated date)
+        rows = list({(row[1], row[0]): row for row in csv_reader}.values())
+        execute_values(cursor, upsert_query, rows, page_size=1000)
     else:
         print('This event does not contain data for the daily_stock_data table.')
 
@@ -17,7 +17,10 @@ echo "PROCESS: Creating database and tables, if they do not exist"
 # Create database and tables, if it does not exist
 export PGPASSWORD=$CLOUD_PASS
 createdb -h $CLOUD_HOST -p $CLOUD_PORT -U $CLOUD_USER $CLOUD_DBNAME                   # Create 'company_stock' database
-psql -h $CLOUD_HOST -p $CLOUD_PORT -U $CLOUD_USER -d $CLOUD_DBNAME -f stock_data.sql  # Create 'company_info' and 'daily_stock_price' tables
+
+# Create 'company_info' and 'daily_stock_price' tables. Set PARTITION_BY_YEAR=on to partition the 
+# daily stock prices by year.
+psql -h $CLOUD_HOST -p $CLOUD_PORT -U $CLOUD_USER -d $CLOUD_DBNAME -f stock_data.sql -v partition_by_year=${PARTITION_BY_YEAR:-off}
 
 unset $CLOUD_PASS
 unset PGPASSWORD
@@ -3,7 +3,12 @@
     average monthly stock price for each ticker.
 */
 
-{{ config(materialized='table') }}
+{{ config(materialized='incremental',
+          unique_key=['ticker', 'month_start_date'],
+          indexes=[{'columns': ['ticker', 'month_start_date'], 'unique': True},
+                   {'columns': ['ingested_at']}],
+          incremental_strategy='delete+insert',
+          on_schema_change='append_new_columns') }}
 
 with monthly_stock_data as (
 	select date_trunc('month', date)::date as monthly_date,
@@ -15,8 +20,17 @@ with monthly_stock_data as (
 		   avg(high) as monthly_high,	
 		   avg(low) as monthly_low,	
 		   avg(close) as monthly_close,
-	       sum(volume) as monthly_volume
+	       sum(volume) as monthly_volume,
+	       max(ingested_at) as ingested_at
 	from {{ ref('company_stock__daily_stock_data') }}
+	{% if is_incremental() %}
+	-- Only recompute the months of the tickers that have newly ingested daily rows
+	where (ticker, date_trunc('month', date)) in (
+		select ticker, date_trunc('month', date)
+		from {{ ref('company_stock__daily_stock_data') }}
+		where ingested_at >= {{ ingested_since() }}
+	)
+	{% endif %}
 	group by monthly_date,
 			 ticker
 	order by monthly_date,
@@ -33,7 +47,8 @@ final as (
 		round(monthly_high::numeric, 3) as monthly_high,
 		round(monthly_low::numeric, 3) as monthly_low,
 		round(monthly_close::numeric, 3) as monthly_close,
-		monthly_volume
+		monthly_volume,
+		ingested_at
 	from monthly_stock_data
 )
 
@@ -3,7 +3,12 @@
     average quarterly stock price for each ticker.
 */
 
-{{ config(materialized='table') }}
+{{ config(materialized='incremental',
+          unique_key=['ticker', 'quarter_start_date'],
+          indexes=[{'columns': ['ticker', 'quarter_start_date'], 'unique': True},
+                   {'columns': ['ingested_at']}],
+          incremental_strategy='delete+insert',
+          on_schema_change='append_new_columns') }}
 
 with quarterly_stock_data as (
 	select date_trunc('quarter', date)::date as quarterly_date,
@@ -15,8 +20,17 @@ with quarterly_stock_data as (
 		   avg(high) as quarterly_high,	
 		   avg(low) as quarterly_low,	
 		   avg(close) as quarterly_close,
-	       sum(volume) as quarterly_volume
+	       sum(volume) as quarterly_volume,
+	       max(ingested_at) as ingested_at
 	from {{ ref('company_stock__daily_stock_data') }}
+	{% if is_incremental() %}
+	-- Only recompute the quarters of the tickers that have newly ingested daily rows
+	where (ticker, date_trunc('quarter', date)) in (
+		select ticker, date_trunc('quarter', date)
+		from {{ ref('company_stock__daily_stock_data') }}
+		where ingested_at >= {{ ingested_since() }}
+	)
+	{% endif %}
 	group by quarterly_date,
 			 ticker
 	order by quarterly_date,
@@ -33,7 +47,8 @@ final as (
 		round(quarterly_high::numeric, 3) as quarterly_high,
 		round(quarterly_low::numeric, 3) as quarterly_low,
 		round(quarterly_close::numeric, 3) as quarterly_close,
-		quarterly_volume
+		quarterly_volume,
+		ingested_at
 	from quarterly_stock_data
 )
 
@@ -0,0 +1,50 @@
+/*
+    Create a Common Table Expression (CTE) for getting the quarterly 
+    return of each ticker from its closing prices.
+*/
+
+{{ config(materialized='incremental',
+          unique_key=['ticker', 'quarter_start_date'],
+          indexes=[{'columns': ['ticker', 'quarter_start_date'], 'unique': True},
+                   {'columns': ['ingested_at']}],
+          incremental_strategy='delete+insert',
+          on_schema_change='append_new_columns') }}
+
+with quarterly_stock_data as (
+	select quarter_start_date,
+	       ticker,
+	       lag(quarter_start_date) over ticker_window as previous_quarter_start_date,
+	       lag(quarterly_close) over ticker_window as previous_quarterly_close,
+	       quarterly_close,
+	       greatest(ingested_at, lag(ingested_at) over ticker_window) as ingested_at
+	from {{ ref('company_stock__quarterly_stock_data') }}
+	{% if is_incremental() %}
+	-- Only recompute the tickers that have newly ingested quarterly bars
+	where ticker in (
+		select ticker
+		from {{ ref('company_stock__quarterly_stock_data') }}
+		where ingested_at >= {{ ingested_since() }}
+	)
+	{% endif %}
+	window ticker_window as (partition by ticker order by quarter_start_date)
+),
+
+final as (
+	select quarter_start_date,
+	       ticker,
+	       previous_quarterly_close,
+	       quarterly_close,
+	       (quarterly_close / previous_quarterly_close - 1)::double precision as quarterly_return,
+	       ingested_at
+	from quarterly_stock_data
+	-- The first quarter of each ticker has no previous close, and returns are only 
+	-- taken between consecutive quarters
+	where previous_quarterly_close is not null
+	  and date_trunc('quarter', previous_quarter_start_date) = date_trunc('quarter', quarter_start_date) - interval '3 months'
+	{% if is_incremental() %}
+	  -- Returns whose quarter or previous quarter changed
+	  and ingested_at >= {{ ingested_since() }}
+	{% endif %}
+)
+
+select * from final
@@ -0,0 +1,50 @@
+/*
+    Create a Common Table Expression (CTE) for getting the yearly 
+    return of each ticker from its closing prices.
+*/
+
+{{ config(materialized='incremental',
+          unique_key=['ticker', 'year_start_date'],
+          indexes=[{'columns': ['ticker', 'year_start_date'], 'unique': True},
+                   {'columns': ['ingested_at']}],
+          incremental_strategy='delete+insert',
+          on_schema_change='append_new_columns') }}
+
+with yearly_stock_data as (
+	select year_start_date,
+	       ticker,
+	       lag(year_start_date) over ticker_window as previous_year_start_date,
+	       lag(yearly_close) over ticker_window as previous_yearly_close,
+	       yearly_close,
+	       greatest(ingested_at, lag(ingested_at) over ticker_window) as ingested_at
+	from {{ ref('company_stock__yearly_stock_data') }}
+	{% if is_incremental() %}
+	-- Only recompute the tickers that have newly ingested yearly bars
+	where ticker in (
+		select ticker
+		from {{ ref('company_stock__yearly_stock_data') }}
+		where ingested_at >= {{ ingested_since() }}
+	)
+	{% endif %}
+	window ticker_window as (partition by ticker order by year_start_date)
+),
+
+final as (
+	select year_start_date,
+	       ticker,
+	       previous_yearly_close,
+	       yearly_close,
+	       (yearly_close / previous_yearly_close - 1)::double precision as yearly_return,
+	       ingested_at
+	from yearly_stock_data
+	-- The first year of each ticker has no previous close, and returns are only 
+	-- taken between consecutive years
+	where previous_yearly_close is not null
+	  and date_trunc('year', previous_year_start_date) = date_trunc('year', year_start_date) - interval '1 year'
+	{% if is_incremental() %}
+	  -- Returns whose year or previous year changed
+	  and ingested_at >= {{ ingested_since() }}
+	{% endif %}
+)
+
+select * from final
@@ -6,92 +6,858 @@ Description: Retrieves information from the database and conducts Mean Variance
 a portfolio according to the specified portfolio settings received through the Streamlit application.
 """
 
+import os
+import tempfile
+import threading
 import numpy as np
 import pandas as pd
 import plotly.graph_objs as go
-from utils import read_stock_database
-from scipy.optimize import minimize, LinearConstraint
+from collections import OrderedDict
+from utils import read_prices, get_data_version, PRICE_CACHE_DIR, PRICE_OVERLAP_DAYS
+from concurrent.futures import ProcessPoolExecutor
+from scipy.optimize import minimize, linprog, LinearConstraint
 
 
-def create_returns_dataframe(df, tickers):
-    # Create a DataFrame with the stock returns for each stock ticker
-    data = {}
-    returns_grouped = df.groupby('ticker')['returns']
+# Create a wide (date x ticker) DataFrame of stock returns from the long returns table (the 
+# period returns computed by the dbt returns models). Returns are pivoted on their dates in 
+# one step, so tickers with different histories stay aligned. The join policy decides what 
+# happens to dates that not every ticker has a return for:
+#   'inner'    - keep only the dates on which every ticker has a return
+#   'outer'    - keep all dates and fill missing returns with that ticker's mean return
+#   'pairwise' - keep all dates and leave missing returns as NaN (for pairwise statistics)
+# With 'inner' and 'outer', every ticker must have at least one return.
+def create_returns_dataframe(df, tickers, date_col, return_col, join='inner'):
+    if join not in ('inner', 'outer', 'pairwise'):
+        raise ValueError(f"Unknown join policy '{join}'. Expected 'inner', 'outer' or 'pairwise'.")
     
-    for ticker in tickers:
-        data[ticker] = returns_grouped.get_group(ticker).reset_index(drop=True)
+    # Pivot the returns of the requested tickers into a date x ticker matrix
+    returns = (df.loc[df['ticker'].isin(tickers), [date_col, 'ticker', return_col]]
+                 .drop_duplicates(subset=[date_col, 'ticker'], keep='last')
+                 .pivot(index=date_col, columns='ticker', values=return_col)
+                 .sort_index()
+                 .reindex(columns=tickers))
+    
+    # A ticker without returns would empty (inner) or poison (outer) the whole matrix
+    missing = [ticker for ticker in tickers if returns[ticker].isna().all()]
+    if join != 'pairwise' and missing:
+        raise ValueError(f'No returns for tickers: {", ".join(missing)}')
+    
+    if join == 'inner':
+        returns = returns.dropna(how='any')
+    elif join == 'outer':
+        returns = returns.fillna(returns.mean())
         
-    return pd.DataFrame(data)
+    return returns
+
+
+# Same as create_returns_dataframe, but returns a contiguous float64 array along with 
+# the date and ticker labels of its rows and columns.
+def create_returns_matrix(df, tickers, date_col, return_col, join='inner'):
+    returns = create_returns_dataframe(df, tickers, date_col, return_col, join=join)
+    
+    return np.ascontiguousarray(returns.to_numpy(dtype=np.float64)), returns.index.to_numpy(), list(returns.columns)
+
+
+# Date and return columns of the returns model of each interval, and the calendar period 
+# that bars of the interval are aligned on
+RETURN_COLUMNS = {
+        'daily': ('date', 'daily_return', 'D'),
+       'weekly': ('week_start_date', 'weekly_return', 'W'),
+      'monthly': ('month_start_date', 'monthly_return', 'M'),
+    'quarterly': ('quarter_start_date', 'quarterly_return', 'Q'),
+       'yearly': ('year_start_date', 'yearly_return', 'Y'),
+}
+
+
+# Read the period returns of a set of tickers (from the dbt returns models, through the local 
+# cache) with every return aligned on the calendar period its bar belongs to
+def read_period_returns(interval, tickers, start=None):
+    date_col, return_col, period = RETURN_COLUMNS[interval]
+    returns_df = read_prices(interval, tickers=tickers, start=start, columns=[date_col, 'ticker', return_col], 
+                             use_cache=True, returns=True)
+    returns_df['period_date'] = returns_df[date_col].dt.to_period(period).dt.to_timestamp()
+    
+    return returns_df
+
+
+# Directory of the persisted sufficient statistics of the return series (one file per interval 
+# and rolling window), kept next to the local price cache
+RETURN_MOMENTS_DIR = os.path.join(PRICE_CACHE_DIR, 'moments')
+
+_moments_lock = threading.Lock()
+
+
+# File that holds the return moments of an interval (and rolling window)
+def return_moments_path(interval, window=None):
+    name = interval if window is None else f'{interval}-{window}'
+    
+    return os.path.join(RETURN_MOMENTS_DIR, f'{name}.npz')
+
+
+# Add (sign=1) or remove (sign=-1) the contribution of a block of return rows (NaN where a 
+# ticker has no return) to the pairwise sufficient statistics of every pair of tickers:
+#   count[i, j] - number of periods on which both tickers have a return
+#   sum[i, j]   - sum of the returns of ticker i over those periods
+#   cross[i, j] - sum of the products of the returns of tickers i and j over those periods
+def _accumulate_moments(moments, returns, sign=1):
+    observed = ~np.isnan(returns)
+    values = np.where(observed, returns, 0.0)
+    observed = observed.astype(np.float64)
+    
+    moments['count'] += sign * (observed.T @ observed)
+    moments['sum'] += sign * (values.T @ observed)
+    moments['cross'] += sign * (values.T @ values)
+
+
+# Period returns of a set of tickers as a (period x ticker) DataFrame, NaN where a ticker has 
+# no return
+def _period_returns_dataframe(interval, tickers, start=None):
+    return_col = RETURN_COLUMNS[interval][1]
+    returns_df = read_period_returns(interval, tickers, start=start)
+    
+    return create_returns_dataframe(returns_df, tickers, 'period_date', return_col, join='pairwise')
+
+
+# Rows of a (period x ticker) returns DataFrame that can still change: those from the period 
+# PRICE_OVERLAP_DAYS before the earliest of the tickers' latest periods with a return onwards. 
+# Ingestion downloads the prices of the last PRICE_OVERLAP_DAYS before each ticker's latest 
+# stored date again, so any of these bars (and the return of the bar after each of them) may 
+# be revised, and a ticker that lags behind the others (e.g. because it was not part of the 
+# last ingestion run) has its later rows still to come.
+def _latest_rows(returns, interval):
+    last_dates = [returns[ticker].last_valid_index() for ticker in returns.columns]
+    last_dates = [last_date for last_date in last_dates if last_date is not None]
+    if not last_dates:
+        return returns.iloc[-1:]
+    
+    period = RETURN_COLUMNS[interval][2]
+    first_date = (min(last_dates) - pd.Timedelta(days=PRICE_OVERLAP_DAYS)).to_period(period).to_timestamp()
+    
+    return returns.loc[first_date:]
 
 
-# Objective functions for performing mean variance optimization (MVO)
-def portfolio_return(weights, returns):
-    return np.dot(returns, weights)
+# Build the sufficient statistics (counts, sums and cross-products per ticker pair) of the 
+# period returns of a set of tickers from their full history. With a rolling window, only 
+# the last `window` periods are counted. The return rows that may still change are kept 
+# alongside the statistics exactly as they were counted (the whole window, or the recent rows 
+# that may still be revised, see _latest_rows) so that revised and late bars can be swapped 
+# in and rows leaving the window can be removed when new bars arrive.
+def build_return_moments(interval, tickers, window=None):
+    tickers = list(tickers)
+    
+    return _moments_from_returns(interval, tickers, window, _period_returns_dataframe(interval, tickers))
 
-def portfolio_volatility(weights, returns):
-    return np.sqrt(np.dot(weights.T, np.dot(returns.cov(), weights)))
+
+# Sufficient statistics and buffered rows of a (period x ticker) returns DataFrame (see 
+# build_return_moments)
+def _moments_from_returns(interval, tickers, window, returns):
+    if window is not None:
+        returns = returns.iloc[-window:]
+    
+    num_assets = len(tickers)
+    moments = {
+        'interval': interval,
+        'window': window,
+        'tickers': tickers,
+        'count': np.zeros((num_assets, num_assets)),
+        'sum': np.zeros((num_assets, num_assets)),
+        'cross': np.zeros((num_assets, num_assets)),
+    }
+    _accumulate_moments(moments, returns.to_numpy(dtype=np.float64))
+    
+    # Keep the buffered rows
+    kept = returns if window is not None else _latest_rows(returns, interval)
+    moments['dates'] = kept.index.to_numpy(dtype='datetime64[ns]')
+    moments['returns'] = kept.to_numpy(dtype=np.float64)
+    
+    return moments
 
 
-# Perform mean variance optimization (MVO) to obtain optimal asset weights
-def mean_variance_optimization(num_simulations, returns, mean_returns, risk_free_rate=0.0, 
-                               allow_shorting=False, maximize_returns=True):
-    num_assets = returns.shape[1]
+# Remove tickers from the return moments (keep is a boolean mask over the tracked tickers)
+def _remove_tickers_from_moments(moments, keep):
+    for name in ('count', 'sum', 'cross'):
+        moments[name] = moments[name][np.ix_(keep, keep)]
+    moments['returns'] = moments['returns'][:, keep]
+    moments['tickers'] = [ticker for ticker, kept in zip(moments['tickers'], keep) if kept]
+    
+    return moments
 
-    def objective_function(weights):
-        if maximize_returns:  
-            # Maximize returns: minimize negative returns
-            return -((portfolio_return(weights, mean_returns) - risk_free_rate) / portfolio_volatility(weights, returns))
+
+# Fold newly arrived bars into the return moments. Only returns from the first buffered period 
+# onwards are read: the buffered rows are swapped for their current versions (recent bars may 
+# have been revised since, e.g. a monthly bar of the current month, and a ticker that lagged 
+# behind the others may have caught up), new rows are added and, with a rolling window, rows 
+# that fall out of the window are removed. Older rows are never read. Tickers that have no 
+# return counted yet are re-added from their full history, like new tickers.
+def update_return_moments(moments):
+    empty = np.diag(moments['count']) == 0
+    if len(moments['dates']) == 0 or empty.all():
+        return build_return_moments(moments['interval'], moments['tickers'], window=moments['window'])
+    
+    if empty.any():
+        empty_tickers = [ticker for ticker, is_empty in zip(moments['tickers'], empty) if is_empty]
+        moments = update_return_moments(_remove_tickers_from_moments(moments, ~empty))
+        return add_tickers_to_moments(moments, empty_tickers)
+    
+    first_date = pd.Timestamp(moments['dates'][0])
+    new_returns = _period_returns_dataframe(moments['interval'], moments['tickers'], start=first_date)
+    if new_returns.empty:
+        return moments
+    
+    # Swap the buffered rows for their current versions (which include the new rows)
+    _accumulate_moments(moments, moments['returns'], sign=-1)
+    _accumulate_moments(moments, new_returns.to_numpy(dtype=np.float64))
+    
+    if moments['window'] is not None:
+        # Remove the rows that have left the rolling window
+        expired = max(len(new_returns) - moments['window'], 0)
+        _accumulate_moments(moments, new_returns.iloc[:expired].to_numpy(dtype=np.float64), sign=-1)
+        kept = new_returns.iloc[expired:]
+    else:
+        kept = _latest_rows(new_returns, moments['interval'])
+    
+    moments['dates'] = kept.index.to_numpy(dtype='datetime64[ns]')
+    moments['returns'] = kept.to_numpy(dtype=np.float64)
+    
+    return moments
+
+
+# Add tickers to the return moments. The new tickers' returns are read first, and tickers that 
+# have none (not ingested yet, or unknown) are not added, so they do not cause the tracked 
+# tickers' returns to be read. Without a rolling window, the returns of the tracked tickers are 
+# then read in full, but only the cross terms that involve a new ticker are computed, at 
+# O(periods x tickers) per new ticker. A rolling window is rebuilt from the returns of all the 
+# tickers over its periods: the new tickers' periods can move the window forward, but a full 
+# window never moves back, so older periods are not read.
+def add_tickers_to_moments(moments, tickers):
+    new_tickers = [ticker for ticker in dict.fromkeys(tickers) if ticker not in moments['tickers']]
+    if not new_tickers:
+        return moments
+    
+    old_tickers = moments['tickers']
+    if len(moments['dates']) == 0:
+        return build_return_moments(moments['interval'], old_tickers + new_tickers, window=moments['window'])
+    
+    dates = pd.DatetimeIndex(moments['dates'])
+    start = dates[0] if moments['window'] is not None and len(dates) == moments['window'] else None
+    new_returns = _period_returns_dataframe(moments['interval'], new_tickers, start=start)
+    new_tickers = [ticker for ticker in new_tickers if new_returns[ticker].notna().any()]
+    if not new_tickers:
+        return moments
+    new_returns = new_returns[new_tickers].dropna(how='all')
+    old_returns = _period_returns_dataframe(moments['interval'], old_tickers, start=start)
+    
+    if moments['window'] is not None:
+        returns = old_returns.join(new_returns, how='outer').sort_index()
+        return _moments_from_returns(moments['interval'], old_tickers + new_tickers, moments['window'], returns)
+    
+    # Returns of the tracked and the new tickers over the periods the moments cover
+    returns = old_returns.join(new_returns, how='outer').sort_index().loc[:dates[-1]]
+    
+    # From the first buffered period onwards, use the buffered rows of the tracked tickers, 
+    # which are the ones counted in the moments (rows that arrived since are not counted)
+    recent = returns.index >= dates[0]
+    buffered = pd.DataFrame(moments['returns'], index=dates, columns=old_tickers)
+    returns.loc[recent, old_tickers] = buffered.reindex(returns.index[recent]).to_numpy()
+    
+    values = returns.to_numpy(dtype=np.float64)
+    observed = ~np.isnan(values)
+    values[~observed] = 0.0
+    observed = observed.astype(np.float64)
+    new = slice(len(old_tickers), None)
+    
+    # Grow the statistics and fill in the blocks of the new tickers
+    num_assets = len(old_tickers) + len(new_tickers)
+    for name in ('count', 'sum', 'cross'):
+        grown = np.zeros((num_assets, num_assets))
+        grown[:len(old_tickers), :len(old_tickers)] = moments[name]
+        moments[name] = grown
+    moments['count'][:, new] = observed.T @ observed[:, new]
+    moments['count'][new, :] = moments['count'][:, new].T
+    moments['sum'][:, new] = values.T @ observed[:, new]
+    moments['sum'][new, :] = values[:, new].T @ observed
+    moments['cross'][:, new] = values.T @ values[:, new]
+    moments['cross'][new, :] = moments['cross'][:, new].T
+    
+    # Buffer the rows that may still change, now including the new tickers
+    kept = _latest_rows(returns, moments['interval'])
+    moments['dates'] = kept.index.to_numpy(dtype='datetime64[ns]')
+    moments['returns'] = kept.to_numpy(dtype=np.float64)
+    moments['tickers'] = old_tickers + new_tickers
+    
+    return moments
+
+
+# Read the return moments of an interval (and rolling window) from disk. Returns None if they 
+# have not been built yet.
+def load_return_moments(interval, window=None):
+    path = return_moments_path(interval, window)
+    if not os.path.exists(path):
+        return None
+    
+    with np.load(path, allow_pickle=False) as data:
+        moments = {name: data[name] for name in data.files}
+    moments['interval'] = interval
+    moments['window'] = window
+    moments['tickers'] = moments['tickers'].tolist()
+    
+    return moments
+
+
+# Write the return moments to disk. Like the price cache files, they are written to a temporary 
+# file of their own in the same directory first, so concurrent writers (threads or processes) 
+# never share a temporary file and readers never see a partial file.
+def save_return_moments(moments):
+    path = return_moments_path(moments['interval'], moments['window'])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    
+    arrays = {name: value for name, value in moments.items() if name not in ('interval', 'window')}
+    arrays['tickers'] = np.array(moments['tickers'], dtype=str)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            np.savez(file, **arrays)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+# Load the persisted return moments of an interval, make sure they track the given tickers, 
+# fold in any bars that arrived since they were last saved and save them again. Tickers that 
+# have no returns (counted) are not kept, so they are looked up again when next requested.
+def refresh_return_moments(interval='monthly', tickers=None, window=None):
+    with _moments_lock:
+        moments = load_return_moments(interval, window)
+        if moments is None:
+            moments = build_return_moments(interval, tickers or [], window=window)
         else:
-            # Minimize risk
-            return portfolio_volatility(weights, returns)  
+            moments = add_tickers_to_moments(moments, tickers or [])
+            moments = update_return_moments(moments)
+        moments = _remove_tickers_from_moments(moments, np.diag(moments['count']) > 0)
+        save_return_moments(moments)
+    
+    return moments
+
+
+# Refresh every return moments file that has been built (e.g. after new data was ingested)
+def refresh_all_return_moments():
+    if not os.path.isdir(RETURN_MOMENTS_DIR):
+        return
+    
+    for file_name in sorted(os.listdir(RETURN_MOMENTS_DIR)):
+        if file_name.endswith('.npz'):
+            interval, _, window = file_name[:-len('.npz')].partition('-')
+            refresh_return_moments(interval, window=int(window) if window else None)
+
+
+# Mean return vector and covariance matrix (per period) of a subset of the tickers tracked by 
+# the return moments, assembled from the pairwise statistics in O(k^2). The covariance of each 
+# pair is taken over the periods both tickers have a return (like pandas' pairwise covariance).
+def moments_statistics(moments, tickers):
+    index = [moments['tickers'].index(ticker) for ticker in tickers]
+    pairs = np.ix_(index, index)
+    count, total, cross = moments['count'][pairs], moments['sum'][pairs], moments['cross'][pairs]
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_returns = np.diag(total) / np.diag(count)
+        covariance_matrix = (cross - total * total.T / count) / (count - 1)
+    covariance_matrix[count < 2] = np.nan
+    
+    return mean_returns, covariance_matrix
+
+
+# Maximum size of the in-memory cache of per-universe return statistics (64 MB)
+STATS_CACHE_MAX_BYTES = 64 * 1024**2
+
+_stats_cache = OrderedDict()
+_stats_cache_lock = threading.Lock()
+
+
+# Drop every cached set of return statistics (e.g. after new data has been ingested)
+def clear_statistics_cache():
+    with _stats_cache_lock:
+        _stats_cache.clear()
+
+
+# Mean return vector and covariance matrix (per period, not annualized) of the returns of a 
+# set of tickers, assembled from the persisted return moments where possible. Results are kept 
+# in an LRU cache keyed by the sorted tickers, the interval, the join policy and the data 
+# version of the returns model, so overlapping requests reuse them and new data in the database 
+# invalidates them. Least recently used entries are evicted once the cache holds more than 
+# STATS_CACHE_MAX_BYTES. Raises ValueError, naming the tickers, if any ticker has fewer than 
+# two returns.
+def universe_statistics(tickers, interval='monthly', join='inner'):
+    return_col = RETURN_COLUMNS[interval][1]
+    sorted_tickers = sorted(set(tickers))
+    key = (tuple(sorted_tickers), interval, join, get_data_version(interval, returns=True))
+    
+    with _stats_cache_lock:
+        cached = _stats_cache.get(key)
+        if cached is not None:
+            _stats_cache.move_to_end(key)
+    
+    if cached is None:
+        # Assemble the statistics from the persisted return moments, after folding in new bars. 
+        # They hold pairwise statistics, which match the other join policies whenever all the 
+        # tickers have returns on exactly the same periods.
+        moments = refresh_return_moments(interval, sorted_tickers)
+        
+        # Every ticker needs at least two returns for its variance (tickers without any returns 
+        # are not kept in the moments)
+        counts = dict(zip(moments['tickers'], np.diag(moments['count'])))
+        missing = [ticker for ticker in sorted_tickers if counts.get(ticker, 0) < 2]
+        if missing:
+            raise ValueError(f'Not enough {interval} returns (at least 2 are needed) for tickers: {", ".join(missing)}')
+        
+        index = [moments['tickers'].index(ticker) for ticker in sorted_tickers]
+        count = moments['count'][np.ix_(index, index)]
+        
+        if join == 'pairwise' or np.all(count == count[0, 0]):
+            mean_returns, covariance_matrix = moments_statistics(moments, sorted_tickers)
+        else:
+            # Read only the returns of the tickers and create a date x ticker matrix from them
+            returns_df = read_period_returns(interval, sorted_tickers)
+            returns, _, _ = create_returns_matrix(returns_df, sorted_tickers, 'period_date', return_col, join=join)
+            if len(returns) < 2:
+                raise ValueError(f'Not enough {interval} returns (at least 2 are needed) on the periods '
+                                 f'shared by tickers: {", ".join(sorted_tickers)}')
+            
+            mean_returns = np.nanmean(returns, axis=0)
+            covariance_matrix = np.cov(returns, rowvar=False)
+        cached = (mean_returns, np.atleast_2d(covariance_matrix))
         
+        with _stats_cache_lock:
+            _stats_cache[key] = cached
+            
+            # Evict least recently used entries until the cache fits its memory budget
+            while (len(_stats_cache) > 1 and 
+                   sum(mean.nbytes + cov.nbytes for mean, cov in _stats_cache.values()) > STATS_CACHE_MAX_BYTES):
+                _stats_cache.popitem(last=False)
+    
+    # Put the statistics in the order the tickers were requested
+    order = [sorted_tickers.index(ticker) for ticker in tickers]
+    mean_returns, covariance_matrix = cached
+    
+    return mean_returns[order], covariance_matrix[np.ix_(order, order)]
+
+
+# Objective functions for performing mean variance optimization (MVO). These operate on 
+# a precomputed mean return vector and covariance matrix (NumPy arrays), so no pandas 
+# objects are touched inside the optimizer loop.
+def portfolio_return(weights, mean_returns):
+    return np.dot(mean_returns, weights)
+
+def portfolio_volatility(weights, cov_matrix):
+    return np.sqrt(np.dot(weights, np.dot(cov_matrix, weights)))
+
+def negative_sharpe_ratio(weights, mean_returns, cov_matrix, risk_free_rate=0.0):
+    return -((portfolio_return(weights, mean_returns) - risk_free_rate) / portfolio_volatility(weights, cov_matrix))
+
+
+# Closed-form derivatives of the objective functions, passed to the solvers so they 
+# do not fall back to finite differences (N + 1 objective evaluations per iteration).
+def portfolio_volatility_gradient(weights, cov_matrix):
+    # d(sigma)/dw = (Cov w) / sigma
+    cov_weights = np.dot(cov_matrix, weights)
+    return cov_weights / np.sqrt(np.dot(weights, cov_weights))
+
+def portfolio_volatility_hessian(weights, cov_matrix):
+    # d2(sigma)/dw2 = Cov / sigma - (Cov w)(Cov w)^T / sigma^3
+    cov_weights = np.dot(cov_matrix, weights)
+    sigma = np.sqrt(np.dot(weights, cov_weights))
+    return cov_matrix / sigma - np.outer(cov_weights, cov_weights) / sigma**3
+
+def negative_sharpe_ratio_gradient(weights, mean_returns, cov_matrix, risk_free_rate=0.0):
+    # d(-S)/dw = -(mu / sigma - (mu^T w - rf) (Cov w) / sigma^3)
+    cov_weights = np.dot(cov_matrix, weights)
+    sigma = np.sqrt(np.dot(weights, cov_weights))
+    excess_return = portfolio_return(weights, mean_returns) - risk_free_rate
+    return -(mean_returns / sigma - excess_return * cov_weights / sigma**3)
+
+
+# SLSQP options for the exact (convex) solves. The objective values are small variances, 
+# so the default tolerance (1e-6) would stop well short of the optimum.
+QP_OPTIONS = {'ftol': 1e-12, 'maxiter': 1000}
+
+
+# Set the bounds of each asset weight
+def weight_bounds(num_assets, allow_shorting):
+    if allow_shorting:
+        # Allow shorting by setting bounds to (-1, 1)
+        return tuple((-1, 1) for _ in range(num_assets))  
+    else:
+        # Disallow shorting by setting bounds to (0, 1)
+        return tuple((0, 1) for _ in range(num_assets))
+
+
+# Minimum variance portfolio: min w^T Cov w subject to sum(w) = 1 and the weight bounds. 
+# This is a convex quadratic program, so a single solve gives the global optimum.
+def min_variance_portfolio(cov_matrix, bounds):
+    num_assets = cov_matrix.shape[0]
+    
+    # Rescale the covariance matrix so the solver tolerances are meaningful for small 
+    # (e.g. monthly) variances. This does not change the optimal weights.
+    cov_matrix = cov_matrix / np.mean(np.diag(cov_matrix))
+    
+    constraints = ({'type': 'eq', 'fun': lambda x: np.sum(x) - 1, 
+                    'jac': lambda x: np.ones_like(x)})
+    
+    result = minimize(lambda w: np.dot(w, np.dot(cov_matrix, w)), np.full(num_assets, 1 / num_assets), 
+                      method='SLSQP', jac=lambda w: 2 * np.dot(cov_matrix, w), 
+                      bounds=bounds, constraints=constraints, options=QP_OPTIONS)
+    return result.x
+
+
+# Maximum Sharpe ratio (tangency) portfolio. Maximizing the Sharpe ratio is not convex in the 
+# weights, but the Charnes-Cooper transform y = k * w (k > 0) turns it into the convex QP
+#   min y^T Cov y  subject to  (mu - rf)^T y = 1,  sum(y) = k,  lower * k <= y <= upper * k,
+# and the optimal weights are recovered as w = y / k. When no portfolio beats the risk-free 
+# rate the transform does not apply and a multistart search is used instead (see 
+# _max_sharpe_ratio_fallback), whose random starts are drawn from seed.
+def max_sharpe_ratio_portfolio(mean_returns, cov_matrix, risk_free_rate, bounds, seed=None):
+    num_assets     = cov_matrix.shape[0]
+    excess_returns = mean_returns - risk_free_rate
+    lower          = np.array([b[0] for b in bounds], dtype=np.float64)
+    upper          = np.array([b[1] for b in bounds], dtype=np.float64)
+    
+    # Find the highest excess return attainable under the constraints (a linear program)
+    best_excess = linprog(-excess_returns, A_eq=np.ones((1, num_assets)), b_eq=[1], bounds=bounds)
+    
+    if not best_excess.success or -best_excess.fun <= 0:
+        # No portfolio beats the risk-free rate, so the transform does not apply
+        return _max_sharpe_ratio_fallback(mean_returns, cov_matrix, risk_free_rate, bounds, seed=seed)
+    
+    # Start from the highest excess return portfolio, scaled so that (mu - rf)^T y = 1
+    x0 = np.append(best_excess.x, 1) / -best_excess.fun
+    
+    # Rescale the covariance matrix so the solver tolerances are meaningful for small 
+    # (e.g. monthly) variances. This does not change the optimal weights.
+    scaled_cov = cov_matrix / np.mean(np.diag(cov_matrix))
+    
+    # Decision variables are z = (y, k)
+    identity = np.eye(num_assets)
+    lower_matrix = np.hstack([identity, -lower[:, None]])   # y - lower * k >= 0
+    upper_matrix = np.hstack([-identity, upper[:, None]])   # upper * k - y >= 0
+    
+    constraints = (
+        {'type': 'eq', 'fun': lambda z: np.dot(excess_returns, z[:-1]) - 1, 
+         'jac': lambda z: np.append(excess_returns, 0)},
+        {'type': 'eq', 'fun': lambda z: np.sum(z[:-1]) - z[-1], 
+         'jac': lambda z: np.append(np.ones(num_assets), -1)},
+        {'type': 'ineq', 'fun': lambda z: np.dot(lower_matrix, z), 'jac': lambda z: lower_matrix},
+        {'type': 'ineq', 'fun': lambda z: np.dot(upper_matrix, z), 'jac': lambda z: upper_matrix},
+    )
+    
+    def objective_function(z):
+        return np.dot(z[:-1], np.dot(scaled_cov, z[:-1]))
+    
+    def objective_gradient(z):
+        return np.append(2 * np.dot(scaled_cov, z[:-1]), 0)
+    
+    result = minimize(objective_function, x0, method='SLSQP', jac=objective_gradient, 
+                      bounds=[(None, None)] * num_assets + [(0, None)], constraints=constraints, 
+                      options=QP_OPTIONS)
+    if not result.success or result.x[-1] <= 0:
+        return _max_sharpe_ratio_fallback(mean_returns, cov_matrix, risk_free_rate, bounds, seed=seed)
+    
+    return np.clip(result.x[:-1] / result.x[-1], lower, upper)
+
+
+# Number of starts of the direct Sharpe ratio search used when no portfolio beats the 
+# risk-free rate
+FALLBACK_NUM_STARTS = 32
+
+
+# Maximize the Sharpe ratio directly. Used when the Charnes-Cooper transform does not apply 
+# (no positive excess return attainable). The problem is then non-convex and has local optima, 
+# so SLSQP is run from the minimum variance portfolio, from each single-asset portfolio and 
+# from random starts (num_starts in total) and the best feasible result is kept. This is a 
+# heuristic: the result is the best optimum found, which is not guaranteed to be global.
+def _max_sharpe_ratio_fallback(mean_returns, cov_matrix, risk_free_rate, bounds, 
+                               num_starts=FALLBACK_NUM_STARTS, seed=None):
+    num_assets = cov_matrix.shape[0]
+    lower      = np.array([b[0] for b in bounds], dtype=np.float64)
+    upper      = np.array([b[1] for b in bounds], dtype=np.float64)
+    
+    constraints = ({'type': 'eq', 'fun': lambda x: np.sum(x) - 1, 
+                    'jac': lambda x: np.ones_like(x)})
+    
+    # Starting points: the minimum variance portfolio, the single-asset portfolios and random 
+    # long-only portfolios (feasible with or without shorting)
+    rng = np.random.default_rng(seed)
+    random_starts  = rng.random((max(num_starts - num_assets - 1, 0), num_assets))
+    random_starts /= random_starts.sum(axis=1, keepdims=True)
+    start_weights  = np.vstack([min_variance_portfolio(cov_matrix, bounds), np.eye(num_assets), random_starts])
+    
+    best_weights, best_objective = start_weights[0], np.inf
+    for weights in start_weights:
+        result = minimize(negative_sharpe_ratio, weights, args=(mean_returns, cov_matrix, risk_free_rate), 
+                          method='SLSQP', jac=negative_sharpe_ratio_gradient, bounds=bounds, 
+                          constraints=constraints)
+        feasible = abs(np.sum(result.x) - 1) < 1e-6 and np.all((result.x >= lower - 1e-9) & (result.x <= upper + 1e-9))
+        if feasible and result.fun < best_objective:
+            best_weights, best_objective = result.x, result.fun
+            
+    return best_weights
+
+
+# Trace the efficient frontier by solving a chain of target-return QPs
+#   min w^T Cov w  subject to  sum(w) = 1,  mu^T w = target,  and the weight bounds,
+# for n_points targets between the minimum variance return and the highest attainable 
+# return. Each solve is warm-started from its neighbour's solution.
+def efficient_frontier(mean_returns, cov_matrix, n_points=50, bounds=None):
+    mean_returns = np.ascontiguousarray(mean_returns, dtype=np.float64)
+    cov_matrix   = np.ascontiguousarray(cov_matrix, dtype=np.float64)
+    num_assets   = cov_matrix.shape[0]
+    
+    if bounds is None:
+        bounds = weight_bounds(num_assets, allow_shorting=False)
+    
+    # Lower end of the frontier: the minimum variance portfolio
+    weights    = min_variance_portfolio(cov_matrix, bounds)
+    min_return = portfolio_return(weights, mean_returns)
+    
+    # Upper end of the frontier: the highest attainable return (a linear program)
+    max_return = -linprog(-mean_returns, A_eq=np.ones((1, num_assets)), b_eq=[1], bounds=bounds).fun
+    
+    # Rescale the covariance matrix so the solver tolerances are meaningful for small 
+    # (e.g. monthly) variances. This does not change the optimal weights.
+    scaled_cov = cov_matrix / np.mean(np.diag(cov_matrix))
+    
+    target_returns   = np.linspace(min_return, max_return, n_points)
+    frontier_risks   = np.zeros(n_points)
+    frontier_weights = np.zeros((n_points, num_assets))
+    
+    for i, target_return in enumerate(target_returns):
+        constraints = (
+            {'type': 'eq', 'fun': lambda x: np.sum(x) - 1, 'jac': lambda x: np.ones_like(x)},
+            {'type': 'eq', 'fun': lambda x, target=target_return: np.dot(mean_returns, x) - target, 
+             'jac': lambda x: mean_returns},
+        )
+        
+        # Warm start from the previous point on the frontier
+        result = minimize(lambda w: np.dot(w, np.dot(scaled_cov, w)), weights, method='SLSQP', 
+                          jac=lambda w: 2 * np.dot(scaled_cov, w), bounds=bounds, constraints=constraints, 
+                          options=QP_OPTIONS)
+        weights = result.x
+        
+        frontier_risks[i]      = portfolio_volatility(weights, cov_matrix)
+        frontier_weights[i, :] = weights
+        
+    return target_returns, frontier_risks, frontier_weights
+
+
+# Memory budget for one batch of random portfolio weights (64 MB)
+SIMULATION_CHUNK_BYTES = 64 * 1024**2
+
+
+# Random portfolios for plotting the cloud of feasible portfolios. Weights are drawn as a 
+# (chunk_size, num_assets) matrix and all returns, risks and Sharpe ratios of a chunk are 
+# computed with a few array operations. Chunking keeps memory bounded for large clouds. The 
+# weights are drawn from a generator seeded with seed (an int, SeedSequence or Generator).
+def simulate_portfolios(num_simulations, mean_returns, cov_matrix, risk_free_rate=0.0, chunk_size=None, 
+                        seed=None):
+    num_assets    = cov_matrix.shape[0]
+    port_returns  = np.empty(num_simulations)
+    port_risks    = np.empty(num_simulations)
+    rng           = np.random.default_rng(seed)
+    
+    if chunk_size is None:
+        # Weight matrix plus the intermediate (weights @ cov) matrix, in float64
+        chunk_size = max(1, SIMULATION_CHUNK_BYTES // (2 * 8 * num_assets))
+    
+    for start in range(0, num_simulations, chunk_size):
+        stop = min(start + chunk_size, num_simulations)
+        
+        # Generate random weights and normalize each row to ensure it sums to 1
+        weights = rng.random((stop - start, num_assets))
+        weights /= weights.sum(axis=1, keepdims=True)
+        
+        port_returns[start:stop] = weights @ mean_returns
+        port_risks[start:stop]   = np.sqrt(np.einsum('ij,jk,ik->i', weights, cov_matrix, weights, optimize=True))
+        
+    sharpe_ratios = (port_returns - risk_free_rate) / port_risks
+        
+    return port_returns, port_risks, sharpe_ratios
+
+
+# Number of random starts handled by each multistart task. Every chunk gets its own random 
+# generator, so results depend only on the seed and not on how many workers run. With an 
+# early stopping rule (patience), chunks hold at most `patience` starts, so the search can stop 
+# soon after the rule is met.
+MULTISTART_CHUNK_SIZE = 250
+
+
+# Run a full optimization from each of num_starts random starts drawn from seed_seq. This is 
+# a module-level function so it can be sent to worker processes.
+def _multistart_chunk(seed_seq, num_starts, mean_returns, cov_matrix, risk_free_rate, 
+                      bounds, maximize_returns):
+    num_assets = cov_matrix.shape[0]
+    
     if maximize_returns:
-        # Set method and contraints for maximizing returns
+        # Set method, objective and contraints for maximizing returns: minimize negative returns
         method='SLSQP'
+        objective_function = negative_sharpe_ratio
+        objective_gradient = negative_sharpe_ratio_gradient
+        args = (mean_returns, cov_matrix, risk_free_rate)
+        hessian=None
         
         # Define optimization constraints: Sum of weights must be 1.
-        constraints = ({'type': 'eq', 'fun': lambda x: np.sum(x) - 1})  
+        constraints = ({'type': 'eq', 'fun': lambda x: np.sum(x) - 1, 
+                        'jac': lambda x: np.ones_like(x)})  
     else:
-        # Set method and contraints for minimizing risk
+        # Set method, objective and contraints for minimizing risk
         method='trust-constr'
+        objective_function = portfolio_volatility
+        objective_gradient = portfolio_volatility_gradient
+        args = (cov_matrix,)
+        hessian=portfolio_volatility_hessian
         
         # Set the constraint that the sum of weights equals 1.
         constraint_matrix = np.ones((1, num_assets))
         constraints = LinearConstraint(constraint_matrix, [1], [1])        
+    
+    # Generate random initial weights, normalized so each row sums to 1
+    rng = np.random.default_rng(seed_seq)
+    start_weights  = rng.random((num_starts, num_assets))
+    start_weights /= start_weights.sum(axis=1, keepdims=True)
+    
+    optimal_weights  = np.zeros((num_starts, num_assets))
+    objective_values = np.zeros(num_starts)
+
+    for i in range(num_starts):
+        # Perform optimization
+        result = minimize(objective_function, start_weights[i], args=args, method=method, 
+                          jac=objective_gradient, hess=hessian, bounds=bounds, constraints=constraints)
+        optimal_weights[i, :] = result.x
+        objective_values[i]   = result.fun
         
-    if allow_shorting:
-        # Allow shorting by setting bounds to (-1, 1)
-        bounds = tuple((-1, 1) for _ in range(num_assets))  
-    else:
-        # Disallow shorting by setting bounds to (0, 1)
-        bounds = tuple((0, 1) for _ in range(num_assets))
-          
-    # Initialize variables
-    port_returns         = np.zeros(num_simulations)
-    port_risks           = np.zeros(num_simulations)
-    sharpe_ratios        = np.zeros(num_simulations)
-    optimal_weights_list = np.zeros((num_simulations, num_assets))
-
-    for i in range(num_simulations):
-        # Generate random initial weights
-        weights = np.random.rand(num_assets)
-        weights /= np.sum(weights)  # Normalize to ensure the sum is 1
-
-        # Expected portfolio return
-        port_returns[i] = portfolio_return(weights, mean_returns)
-    
-        # Expected portfolio risk (standard deviation)
-        port_risks[i] = portfolio_volatility(weights, returns)
+    return start_weights, optimal_weights, objective_values
+
+
+# Adaptive stopping rule for the multistart search. Walks the starts in order and returns the 
+# number of starts needed until the best objective (and its weights) went `patience` consecutive 
+# starts without improving by more than tol, or None if that never happened.
+def _early_stop_index(optimal_weights, objective_values, state, patience, tol):
+    for i in range(len(objective_values)):
+        if objective_values[i] < state['best_objective']:
+            # A better optimum only counts as an improvement if it moved beyond the tolerance
+            if (state['best_weights'] is None or state['best_objective'] - objective_values[i] > tol or 
+                np.max(np.abs(optimal_weights[i] - state['best_weights'])) > tol):
+                state['stale_starts'] = 0
+            else:
+                state['stale_starts'] += 1
+            state['best_objective'] = objective_values[i]
+            state['best_weights']   = optimal_weights[i]
+        else:
+            state['stale_starts'] += 1
+            
+        if state['stale_starts'] >= patience:
+            return i + 1
         
-        # Sharpe Ratio
-        sharpe_ratios[i] = (port_returns[i] - risk_free_rate) / port_risks[i]
+    return None
+
+
+# Perform mean variance optimization (MVO) to obtain optimal asset weights.
+# solver='exact' solves the convex problem once and returns a single portfolio (when no 
+# portfolio beats the risk-free rate, the max Sharpe ratio portfolio comes from a seeded 
+# multistart search instead, see _max_sharpe_ratio_fallback); 
+# solver='multistart' runs a full optimization from each of num_simulations random starts, 
+# spread over n_jobs worker processes (-1 uses every core). Pass a seed for reproducible 
+# starts; the result for a given seed is the same for any n_jobs. If patience is set, the 
+# search stops once the best optimum has not improved beyond tol for that many consecutive 
+# starts, and the returned arrays only cover the starts up to that point. Chunks are handed to 
+# the workers in order, at most n_jobs ahead of the one being checked, and chunks not started 
+# yet are cancelled when the search stops. Besides the returns, risks, Sharpe ratios and 
+# weights, an info dict is returned with the number of optimizations that actually ran 
+# ('num_starts', 0 for the exact solver; this includes the rest of the chunk the search stopped 
+# in and the chunks that were already running) and whether the search stopped early 
+# ('stopped_early').
+def mean_variance_optimization(num_simulations, mean_returns, cov_matrix, risk_free_rate=0.0, 
+                               allow_shorting=False, maximize_returns=True, solver='multistart', 
+                               seed=None, n_jobs=1, patience=None, tol=1e-8):
+    # Make sure the inputs are contiguous float arrays (accepts pandas objects as well)
+    mean_returns = np.ascontiguousarray(mean_returns, dtype=np.float64)
+    cov_matrix   = np.ascontiguousarray(cov_matrix, dtype=np.float64)
+    num_assets   = cov_matrix.shape[0]
+    bounds       = weight_bounds(num_assets, allow_shorting)
+    
+    if solver == 'exact':
+        if maximize_returns:
+            weights = max_sharpe_ratio_portfolio(mean_returns, cov_matrix, risk_free_rate, bounds, seed=seed)
+        else:
+            weights = min_variance_portfolio(cov_matrix, bounds)
         
-        # Perform optimization
-        result = minimize(objective_function, weights, method=method, 
-                          bounds=bounds, constraints=constraints)
-        optimal_weights_list[i, :] = result.x
+        port_return = portfolio_return(weights, mean_returns)
+        port_risk   = portfolio_volatility(weights, cov_matrix)
+        
+        return (np.array([port_return]), np.array([port_risk]), 
+                np.array([(port_return - risk_free_rate) / port_risk]), weights[None, :], 
+                {'num_starts': 0, 'stopped_early': False})
+    elif solver != 'multistart':
+        raise ValueError(f"Unknown solver '{solver}'. Expected 'exact' or 'multistart'.")
+    
+    # Split the starts into fixed-size chunks, each with its own spawned seed
+    chunk_size  = MULTISTART_CHUNK_SIZE if patience is None else max(min(MULTISTART_CHUNK_SIZE, patience), 1)
+    chunk_sizes = [min(chunk_size, num_simulations - start) for start in range(0, num_simulations, chunk_size)]
+    chunk_seeds = np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+    chunk_args  = (mean_returns, cov_matrix, risk_free_rate, bounds, maximize_returns)
+    
+    if n_jobs == -1:
+        n_jobs = os.cpu_count()
+        
+    executor = ProcessPoolExecutor(max_workers=n_jobs) if n_jobs > 1 and len(chunk_sizes) > 1 else None
+    futures  = {}
+    
+    # Collect the chunks in order, stopping early if the best optimum has stabilized
+    results    = []
+    num_starts = 0
+    stop_state = {'best_objective': np.inf, 'best_weights': None, 'stale_starts': 0}
+    try:
+        for index, (chunk_seed, num_chunk_starts) in enumerate(zip(chunk_seeds, chunk_sizes)):
+            if executor is None:
+                chunk_result = _multistart_chunk(chunk_seed, num_chunk_starts, *chunk_args)
+            else:
+                # Keep the workers busy with the next chunks, but no more than n_jobs ahead
+                for ahead in range(index, min(index + n_jobs, len(chunk_sizes))):
+                    if ahead not in futures:
+                        futures[ahead] = executor.submit(_multistart_chunk, chunk_seeds[ahead], 
+                                                         chunk_sizes[ahead], *chunk_args)
+                chunk_result = futures.pop(index).result()
+            
+            start_weights, optimal_weights, objective_values = chunk_result
+            num_starts += num_chunk_starts
+            
+            stop_index = None
+            if patience is not None:
+                stop_index = _early_stop_index(optimal_weights, objective_values, stop_state, patience, tol)
+                
+            if stop_index is not None:
+                results.append((start_weights[:stop_index], optimal_weights[:stop_index]))
+                break
+            results.append((start_weights, optimal_weights))
+    finally:
+        if executor is not None:
+            # Cancel the chunks that have not started yet. The ones already running are finished.
+            executor.shutdown(wait=True, cancel_futures=True)
+            num_starts += sum(chunk_sizes[ahead] for ahead, future in futures.items() if not future.cancelled())
+    
+    if results:
+        start_weights        = np.vstack([result[0] for result in results])
+        optimal_weights_list = np.vstack([result[1] for result in results])
+    else:
+        start_weights        = np.zeros((0, num_assets))
+        optimal_weights_list = np.zeros((0, num_assets))
+    
+    info = {'num_starts': num_starts, 'stopped_early': len(start_weights) < num_simulations}
+    
+    # Expected returns, risks (standard deviation) and Sharpe ratios of the random starts
+    port_returns  = start_weights @ mean_returns
+    port_risks    = np.sqrt(np.einsum('ij,jk,ik->i', start_weights, cov_matrix, start_weights, optimize=True))
+    sharpe_ratios = (port_returns - risk_free_rate) / port_risks
 
-    return port_returns, port_risks, sharpe_ratios, optimal_weights_list
+    return port_returns, port_risks, sharpe_ratios, optimal_weights_list, info
 
 
 # Displays the asset allocation results of the MVO
@@ -115,48 +881,79 @@ def asset_allocation(tickers, maximize_returns, allow_shorting,
         return min_port_risk_Y, min_port_risk_X, tickers, min_port_risk_weights
     
 
-def optimize(tickers, risk_free_rate, allow_shorting, maximize_returns):
+# Optimize the portfolio. With solver='exact' the optimal portfolios come from a single convex 
+# solve each and num_simulations only sets the size of the random portfolio cloud in the plot 
+# (0 disables it). With solver='multistart' every simulation is also an optimization start, 
+# spread over n_jobs worker processes and optionally stopped early (patience). seed makes the 
+# random portfolios (and starts) reproducible with either solver. 
+# join sets how tickers with different histories are aligned (see create_returns_dataframe).
+def optimize(tickers, risk_free_rate, allow_shorting, maximize_returns, 
+             solver='exact', num_simulations=10000, seed=None, n_jobs=1, patience=None, 
+             join='inner'):
     try:
         # Convert tickers to a list if it's not already in list format
         tickers = tickers.split(', ')
     except AttributeError:
         None
-        
-    num_simulations  = 10000   # Number of simulations
-    
-    # Read stock data from the database
-    info_df, price_df = read_stock_database('monthly')
     
-    # Create a new column with the calculated stock returns
-    price_df['returns'] = price_df.groupby('ticker')['monthly_close'].pct_change()
-    price_df = price_df.fillna(value=price_df['returns'].mean())
-   
-    # Create a Dataframe with only the returns for each ticker
-    returns_df = create_returns_dataframe(price_df, tickers)
+    # Get the mean vector and covariance matrix of the monthly returns, computed once 
+    # (and cached across requests) as NumPy arrays
+    mean_returns, covariance_matrix = universe_statistics(tickers, 'monthly', join=join)
 
     # Calculate annualized average return for each stock
     # Annualized average return = monthly average return * 12 months
-    mean_returns = np.mean(returns_df, axis=0) * 12
-    covariance_matrix = returns_df.cov()
-    
-    # Perform MVO simulation
-    port_returns, port_risks, sharpe_ratios, optimal_weights_list =\
-        mean_variance_optimization(num_simulations, returns_df, mean_returns, 
-                                   risk_free_rate=risk_free_rate, 
-                                   allow_shorting=allow_shorting, 
-                                   maximize_returns=maximize_returns)
-    
-    # Find the portfolio with the highest sharpe ratio
-    max_sharpe_ratio_idx     = np.argmax(sharpe_ratios) 
-    max_sharpe_ratio_return  = port_returns[max_sharpe_ratio_idx]
-    max_sharpe_ratio_risk    = port_risks[max_sharpe_ratio_idx]
-    max_sharpe_ratio_weights = optimal_weights_list[max_sharpe_ratio_idx, :]
-    
-    # Find the portfolio with the lowest risk (volatility)
-    min_port_risk_idx     = np.argmin(port_risks) 
-    min_port_risk_X       = port_risks[min_port_risk_idx]
-    min_port_risk_Y       = port_returns[min_port_risk_idx]
-    min_port_risk_weights = optimal_weights_list[min_port_risk_idx, :]
+    mean_returns = mean_returns * 12
+    
+    if solver == 'exact':
+        # Solve directly for the max sharpe ratio (tangency) portfolio
+        max_sharpe_returns, max_sharpe_risks, _, max_sharpe_weights, _ =\
+            mean_variance_optimization(0, mean_returns, covariance_matrix, 
+                                       risk_free_rate=risk_free_rate, 
+                                       allow_shorting=allow_shorting, 
+                                       maximize_returns=True, solver='exact', seed=seed)
+        max_sharpe_ratio_return  = max_sharpe_returns[0]
+        max_sharpe_ratio_risk    = max_sharpe_risks[0]
+        max_sharpe_ratio_weights = max_sharpe_weights[0, :]
+        
+        # Solve directly for the minimum risk portfolio
+        min_risk_returns, min_risk_risks, _, min_risk_weights, _ =\
+            mean_variance_optimization(0, mean_returns, covariance_matrix, 
+                                       risk_free_rate=risk_free_rate, 
+                                       allow_shorting=allow_shorting, 
+                                       maximize_returns=False, solver='exact')
+        min_port_risk_X       = min_risk_risks[0]
+        min_port_risk_Y       = min_risk_returns[0]
+        min_port_risk_weights = min_risk_weights[0, :]
+        
+        # Random portfolios are only used for the scatter plot
+        port_returns, port_risks, sharpe_ratios =\
+            simulate_portfolios(num_simulations, mean_returns, covariance_matrix, 
+                                risk_free_rate=risk_free_rate, seed=seed)
+    else:
+        # Perform MVO simulation
+        port_returns, port_risks, sharpe_ratios, optimal_weights_list, _ =\
+            mean_variance_optimization(num_simulations, mean_returns, covariance_matrix, 
+                                       risk_free_rate=risk_free_rate, 
+                                       allow_shorting=allow_shorting, 
+                                       maximize_returns=maximize_returns, solver='multistart', 
+                                       seed=seed, n_jobs=n_jobs, patience=patience)
+        
+        # Find the portfolio with the highest sharpe ratio
+        max_sharpe_ratio_idx     = np.argmax(sharpe_ratios) 
+        max_sharpe_ratio_return  = port_returns[max_sharpe_ratio_idx]
+        max_sharpe_ratio_risk    = port_risks[max_sharpe_ratio_idx]
+        max_sharpe_ratio_weights = optimal_weights_list[max_sharpe_ratio_idx, :]
+        
+        # Find the portfolio with the lowest risk (volatility)
+        min_port_risk_idx     = np.argmin(port_risks) 
+        min_port_risk_X       = port_risks[min_port_risk_idx]
+        min_port_risk_Y       = port_returns[min_port_risk_idx]
+        min_port_risk_weights = optimal_weights_list[min_port_risk_idx, :]
+    
+    # Trace the efficient frontier curve
+    frontier_returns, frontier_risks, _ =\
+        efficient_frontier(mean_returns, covariance_matrix, 
+                           bounds=weight_bounds(len(tickers), allow_shorting))
      
     # Points for the Capital Allocation Line (CAL)
     cal_points       = np.zeros((2, 2))     
@@ -179,6 +976,15 @@ def optimize(tickers, risk_free_rate, allow_shorting, maximize_returns):
         name='Portfolios',
     )
 
+    # Plot configurations for the efficient frontier
+    frontier = go.Scatter(
+        x=frontier_risks,
+        y=frontier_returns,
+        mode='lines',
+        line=dict(color='black', width=3),
+        name='Efficient Frontier',
+    )
+
     # Plot configurations for max sharpe ratio
     max_sharpe_ratio = go.Scatter(
         x=[max_sharpe_ratio_risk],
@@ -257,7 +1063,7 @@ def optimize(tickers, risk_free_rate, allow_shorting, maximize_returns):
         )
 
     # Create a figure object with the traces
-    fig = go.Figure([portfolios, max_sharpe_ratio, min_port_risk, risk_free_asset, 
+    fig = go.Figure([portfolios, frontier, max_sharpe_ratio, min_port_risk, risk_free_asset, 
                      cal, max_return_per_asset], layout=dict(annotations=annotations))
     
     # Customize plot layout
@@ -12,8 +12,8 @@ echo
 # Create and update dbt models in the database    
 cd portfolio_optimization_project_dbt # Change to dbt project directory
 dbt debug                             # Check to ensure connections are setup properly
-dbt clean                             # Delete the dbt_packages and target directories
-dbt run                               # Run dbt models
+dbt run                               # Run dbt models (incremental: only periods with new daily rows;
+                                      # models built before ingested_at was added are migrated in place)
 dbt test                              # Test models
 
 echo
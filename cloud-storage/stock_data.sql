@@ -1,7 +1,8 @@
 -- File: stock_data.sql (cloud deployment)
 -- Author: Ty Rawls
 -- Date: 2024-03-07
--- Description: Create tables to store the company information and daily stock price data. 
+-- Description: Create tables to store the company information and daily stock price data, along with 
+-- the keys and indexes used to read and upsert them. 
 -- This procedure is initialized by 'db_init.sh'.
 
 CREATE TABLE IF NOT EXISTS company_info(
@@ -15,6 +16,17 @@ CREATE TABLE IF NOT EXISTS company_info(
 	ingested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP  -- Audit column
 );
 
+-- Daily stock prices are keyed on (ticker, date). The primary key index also carries the 
+-- closing price, so watermark lookups (max(date) per ticker), duplicate checks and close-price 
+-- reads by ticker and date are index-only scans, and ingestion can upsert with ON CONFLICT.
+-- Set the psql variable 'partition_by_year' (e.g. psql -v partition_by_year=on) to create the 
+-- table range-partitioned by year instead.
+\if :{?partition_by_year}
+\else
+	\set partition_by_year off
+\endif
+
+\if :partition_by_year
 CREATE TABLE IF NOT EXISTS daily_stock_data (
 	date DATE,
 	ticker VARCHAR(4),
@@ -24,8 +36,80 @@ CREATE TABLE IF NOT EXISTS daily_stock_data (
 	close FLOAT,
 	volume INT,
 	ingested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,  -- Audit column
+	CONSTRAINT daily_stock_data_pkey                  -- Set primary key
+		PRIMARY KEY (ticker, date) INCLUDE (close),
 	CONSTRAINT fk_ticker                              -- Set foreign key
     	FOREIGN KEY(ticker) 
     		REFERENCES company_info(ticker)
 			ON DELETE CASCADE
-);
\ No newline at end of file
+) PARTITION BY RANGE (date);
+
+-- Create the yearly partitions of daily_stock_data that do not exist yet. Rows of those years 
+-- that were stored in the default partition are moved into the new partition.
+CREATE OR REPLACE FUNCTION create_daily_stock_data_partitions(first_year INT, last_year INT) 
+RETURNS VOID AS $$
+DECLARE
+	partition_year INT;
+BEGIN
+	FOR partition_year IN first_year..last_year LOOP
+		CONTINUE WHEN to_regclass(format('daily_stock_data_%s', partition_year)) IS NOT NULL;
+		
+		CREATE TEMP TABLE moved_stock_data (LIKE daily_stock_data) ON COMMIT DROP;
+		WITH moved AS (
+			DELETE FROM daily_stock_data_default
+			WHERE date >= make_date(partition_year, 1, 1) AND date < make_date(partition_year + 1, 1, 1)
+			RETURNING *
+		)
+		INSERT INTO moved_stock_data SELECT * FROM moved;
+		
+		EXECUTE format('CREATE TABLE daily_stock_data_%s PARTITION OF daily_stock_data FOR VALUES FROM (%L) TO (%L)', 
+		               partition_year, make_date(partition_year, 1, 1), make_date(partition_year + 1, 1, 1));
+		
+		INSERT INTO daily_stock_data SELECT * FROM moved_stock_data;
+		DROP TABLE moved_stock_data;
+	END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Rows outside the yearly partitions land in the default partition. Run this file again (or 
+-- call the function) each year to add the partition of the coming year.
+CREATE TABLE IF NOT EXISTS daily_stock_data_default PARTITION OF daily_stock_data DEFAULT;
+SELECT create_daily_stock_data_partitions(1970, extract(year FROM CURRENT_DATE)::INT + 1);
+\else
+CREATE TABLE IF NOT EXISTS daily_stock_data (
+	date DATE,
+	ticker VARCHAR(4),
+	open FLOAT,
+	high FLOAT,
+	low FLOAT,
+	close FLOAT,
+	volume INT,
+	ingested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,  -- Audit column
+	CONSTRAINT daily_stock_data_pkey                  -- Set primary key
+		PRIMARY KEY (ticker, date) INCLUDE (close),
+	CONSTRAINT fk_ticker                              -- Set foreign key
+    	FOREIGN KEY(ticker) 
+    		REFERENCES company_info(ticker)
+			ON DELETE CASCADE
+);
+\endif
+
+-- Databases created before the primary key existed: remove duplicate (ticker, date) rows, 
+-- keeping the most recently ingested one, and add the key
+DO $$
+BEGIN
+	IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'daily_stock_data_pkey') THEN
+		DELETE FROM daily_stock_data WHERE ticker IS NULL OR date IS NULL;
+		DELETE FROM daily_stock_data AS older
+		USING daily_stock_data AS newer
+		WHERE older.ticker = newer.ticker
+		  AND older.date = newer.date
+		  AND (older.ingested_at, older.ctid) < (newer.ingested_at, newer.ctid);
+		ALTER TABLE daily_stock_data 
+			ADD CONSTRAINT daily_stock_data_pkey PRIMARY KEY (ticker, date) INCLUDE (close);
+	END IF;
+END;
+$$;
+
+-- Incremental dbt runs pick up the rows ingested since their last run
+CREATE INDEX IF NOT EXISTS daily_stock_data_ingested_at_idx ON daily_stock_data (ingested_at);
\ No newline at end of file
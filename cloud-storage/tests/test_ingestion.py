@@ -0,0 +1,196 @@
+import json
+import threading
+from io import StringIO
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import utils
+
+
+# Daily prices of a ticker in the layout yf.download returns for a single ticker
+def make_history(ticker, start=None):
+    dates = pd.bdate_range('2023-12-01', '2024-01-31', name='Date')
+    rng = np.random.default_rng(sum(map(ord, ticker)))
+    close = np.round(100 + rng.normal(0, 1, len(dates)).cumsum(), 2)
+    history = pd.DataFrame({'Open': close, 'High': close + 1, 'Low': close - 1, 'Close': close,
+                            'Adj Close': close * 0.9, 'Volume': np.arange(len(dates)) * 10.0}, index=dates)
+
+    return history[history.index >= pd.Timestamp(start or '1900-01-01')]
+
+
+# Fake downloader returning a batched yf.download frame (price fields by ticker columns)
+def fake_downloader(tickers, period='10y', start=None):
+    return pd.concat({ticker: make_history(ticker, start) for ticker in tickers}, axis=1).swaplevel(0, 1, axis=1)
+
+
+# Local stub of the FMP company profile endpoint, counting the requests it serves
+@pytest.fixture
+def fmp_server(monkeypatch, tmp_path):
+    requests = []
+
+    class ProfileHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            ticker = self.path.split('/')[-1].split('?')[0].upper()
+            requests.append(ticker)
+            body = json.dumps([{'symbol': ticker, 'companyName': f'{ticker} Inc.', 'exchangeShortName': 'NYSE',
+                                'ceo': 'CEO', 'sector': 'Sector', 'industry': 'Industry', 'mktCap': 1000}])
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(body.encode())
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ProfileHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv('FMP_API_URL', f'http://127.0.0.1:{server.server_port}/profile/')
+    monkeypatch.setenv('FMP_API_KEY', '?apikey=test')
+    monkeypatch.setattr(utils, 'FMP_USAGE_PATH', str(tmp_path / 'fmp-usage.json'))
+
+    yield requests
+
+    server.shutdown()
+    server.server_close()
+
+
+# Fake database holding AAA (company info and prices up to 2024-01-15) and an S3 bucket that
+# records the pushed files
+@pytest.fixture
+def staged(monkeypatch):
+    pushed = {}
+    ingested_at = pd.Timestamp('2024-01-15 18:00')
+    stored_prices = make_history('AAA').loc[:'2024-01-15'].reset_index()
+    stored_prices = pd.DataFrame({'date': stored_prices['Date'], 'ticker': 'AAA', 'open': stored_prices['Open'],
+                                  'high': stored_prices['High'], 'low': stored_prices['Low'],
+                                  'close': stored_prices['Close'], 'volume': stored_prices['Volume'],
+                                  'ingested_at': ingested_at})
+    stored_info = pd.DataFrame({'ticker': ['AAA'], 'company_name': ['AAA Inc.'], 'exchange': ['NYSE'], 'ceo': ['CEO'],
+                                'sector': ['Sector'], 'industry': ['Industry'], 'market_cap': [1000],
+                                'ingested_at': [ingested_at]})
+
+    def fake_read_prices(tickers=None, start=None, **kwargs):
+        prices = stored_prices[stored_prices['ticker'].isin(tickers)]
+        return prices[prices['date'] >= pd.Timestamp(start)] if start is not None else prices
+
+    monkeypatch.setattr(utils, 'read_company_info', lambda tickers=None, use_cache=True:
+                        stored_info[stored_info['ticker'].isin(tickers)])
+    monkeypatch.setattr(utils, 'read_latest_price_dates', lambda tickers:
+                        {'AAA': stored_prices['date'].max()} if 'AAA' in tickers else {})
+    monkeypatch.setattr(utils, 'read_prices', fake_read_prices)
+    monkeypatch.setattr(utils, 'push_to_s3', lambda content, bucket, key: pushed.__setitem__(key, content))
+
+    return pushed
+
+
+# Staging one ticker at a time and staging them concurrently write the same files
+def test_serial_and_concurrent_staging_match(fmp_server, staged):
+    assert utils.get_historical_stock_data('AAA, BBB, CCC', max_workers=1, downloader=fake_downloader) == []
+    serial = dict(staged)
+    staged.clear()
+
+    assert utils.get_historical_stock_data('AAA, BBB, CCC', max_workers=3, downloader=fake_downloader) == []
+    assert staged == serial
+    assert sorted(fmp_server) == ['AAA', 'AAA', 'BBB', 'BBB', 'CCC', 'CCC']
+
+    # AAA only gets the prices after its latest stored date, and its unchanged info is not staged
+    aaa_prices = [pd.read_csv(StringIO(content)) for key, content in serial.items()
+                  if key.startswith('stock-price/api_') and '_aaa_' in key]
+    assert len(aaa_prices) == 1 and aaa_prices[0]['date'].min() > '2024-01-15'
+    assert not any(key.startswith('stock-info/') and '_aaa_' in key for key in serial)
+
+
+# Once the FMP quota is used up, tickers already in the database still get their prices staged
+# and new tickers are skipped (and reported)
+def test_fmp_quota_skips_new_tickers(fmp_server, staged, monkeypatch):
+    monkeypatch.setattr(utils, 'FMP_DAILY_REQUEST_LIMIT', 1)
+
+    skipped = utils.get_historical_stock_data('BBB, AAA, CCC', max_workers=1, downloader=fake_downloader)
+
+    assert skipped == ['CCC']
+    assert fmp_server == ['BBB']
+    assert sorted(key.split('_')[2:4] for key in staged) == [['aaa', 'price'], ['bbb', 'info'], ['bbb', 'price']]
+
+
+# A batched download is split per ticker: rows without a close are dropped, the dates lose
+# their time zone and tickers without any prices are left out
+def test_split_price_download_batched():
+    raw = fake_downloader(['AAA', 'BBB', 'CCC'])
+    raw.index = raw.index.tz_localize('America/New_York')
+    raw.loc[raw.index[:2], ('Close', 'BBB')] = np.nan
+    raw.loc[:, (slice(None), 'CCC')] = np.nan
+
+    price_dfs = utils.split_price_download(raw, ['AAA', 'BBB', 'CCC'])
+
+    assert list(price_dfs) == ['AAA', 'BBB']
+    assert len(price_dfs['AAA']) == len(raw) and len(price_dfs['BBB']) == len(raw) - 2
+    for ticker, price_df in price_dfs.items():
+        assert (price_df['ticker'] == ticker).all()
+        assert price_df['date'].dt.tz is None
+        assert {'date', 'ticker', 'open', 'high', 'low', 'close', 'volume'} <= set(price_df.columns)
+        np.testing.assert_array_equal(price_df['close'], make_history(ticker)['Close'].dropna().iloc[-len(price_df):])
+
+
+# A single-ticker download comes back with flat columns
+def test_split_price_download_single_ticker():
+    raw = make_history('AAA')
+    raw.loc[raw.index[-1], 'Close'] = np.nan
+
+    price_dfs = utils.split_price_download(raw, ['aaa'])
+
+    assert list(price_dfs) == ['AAA']
+    assert len(price_dfs['AAA']) == len(raw) - 1
+    np.testing.assert_array_equal(price_dfs['AAA']['date'], raw.index[:-1])
+
+
+# Tickers missing from a batch (or from a batch that failed) are retried on their own, and only
+# those tickers
+@pytest.mark.parametrize('failing_batch', [False, True])
+def test_download_prices_retries_failed_tickers(monkeypatch, failing_batch):
+    monkeypatch.setattr(utils.time, 'sleep', lambda seconds: None)
+    calls = []
+    missing = {'CCC': 1, 'EEE': 5}
+
+    def flaky_downloader(tickers, period='10y', start=None):
+        calls.append((list(tickers), start))
+        if failing_batch and len(tickers) > 1:
+            raise ConnectionError('batch failed')
+        raw = fake_downloader(tickers, start=start)
+        for ticker in tickers:
+            if missing.get(ticker, 0) > 0:
+                missing[ticker] -= 1
+                raw.loc[:, (slice(None), ticker)] = np.nan
+        return raw
+
+    price_dfs = utils.download_prices(['aaa', 'BBB', 'CCC', 'DDD', 'EEE'], start_dates={'DDD': '2024-01-10'},
+                                      downloader=flaky_downloader, batch_size=3, retries=2)
+
+    assert sorted(price_dfs) == ['AAA', 'BBB', 'CCC', 'DDD']
+    assert price_dfs['DDD']['date'].min() >= pd.Timestamp('2024-01-10')
+
+    batches = [(['AAA', 'BBB', 'CCC'], None), (['EEE'], None), (['DDD'], '2024-01-10')]
+    retried = ['CCC', 'EEE', 'EEE'] if not failing_batch else ['AAA', 'BBB', 'CCC', 'CCC', 'EEE', 'EEE']
+    assert calls == batches + [([ticker], None) for ticker in retried]
+
+
+# Every new or revised row is selected, whichever columns changed; unchanged rows are not, also
+# when some of their values are missing on both sides
+def test_select_new_rows():
+    dates = pd.date_range('2024-01-01', periods=6)
+    db_df = pd.DataFrame({'date': dates, 'ticker': 'AAA', 'close': [10.0, 11.0, np.nan, 13.0, 14.0, np.nan],
+                          'volume': [100, 110, 120, 130, 140, 150]})
+    api_df = pd.DataFrame({'date': dates.append(pd.date_range('2024-01-07', periods=2)), 'ticker': 'AAA',
+                           'close': [10.0, 11.5, np.nan, 13.0, np.nan, 15.0, 16.0, np.nan],
+                           'volume': [100, 110, 120, 131, 140, 150, 160, 170]})
+
+    new_rows = utils.select_new_rows(api_df, db_df, ['ticker', 'date'])
+
+    # Revised close (01-02), volume (01-04), close dropped (01-05) and close filled in (01-06),
+    # and the two new dates
+    expected = pd.to_datetime(['2024-01-02', '2024-01-04', '2024-01-05', '2024-01-06', '2024-01-07', '2024-01-08'])
+    assert list(new_rows['date']) == list(expected)
+    pd.testing.assert_frame_equal(new_rows, api_df[api_df['date'].isin(expected)])
+    assert utils.select_new_rows(db_df, db_df, ['ticker', 'date']).empty
+    assert utils.select_new_rows(api_df, db_df.iloc[:0], ['ticker', 'date']) is api_df
@@ -0,0 +1,126 @@
+import numpy as np
+import pytest
+from scipy.optimize import approx_fprime, check_grad
+
+import portfolio_optimizer
+from portfolio_optimizer import (max_sharpe_ratio_portfolio, mean_variance_optimization, 
+                                 negative_sharpe_ratio, negative_sharpe_ratio_gradient, 
+                                 portfolio_volatility, portfolio_volatility_gradient, 
+                                 portfolio_volatility_hessian, simulate_portfolios, weight_bounds)
+
+
+# Mean monthly returns, a positive definite covariance matrix and a set of portfolio weights 
+# (long-only, or with short positions)
+@pytest.fixture(params=[False, True], ids=['long-only', 'shorting'])
+def portfolio(request):
+    rng = np.random.default_rng(0)
+    num_assets = 6
+    
+    factors = rng.normal(0, 0.05, (num_assets, num_assets))
+    cov_matrix = factors @ factors.T + np.diag(rng.uniform(1e-4, 1e-3, num_assets))
+    mean_returns = rng.normal(0.01, 0.02, num_assets)
+    
+    weights = rng.uniform(-1, 1, num_assets) if request.param else rng.random(num_assets)
+    weights /= weights.sum()
+    
+    return weights, mean_returns, cov_matrix
+
+
+def test_portfolio_volatility_gradient(portfolio):
+    weights, _, cov_matrix = portfolio
+    
+    error = check_grad(portfolio_volatility, portfolio_volatility_gradient, weights, cov_matrix)
+    assert error < 1e-6 * np.linalg.norm(portfolio_volatility_gradient(weights, cov_matrix))
+
+
+@pytest.mark.parametrize('risk_free_rate', [0.0, 0.004])
+def test_negative_sharpe_ratio_gradient(portfolio, risk_free_rate):
+    weights, mean_returns, cov_matrix = portfolio
+    args = (mean_returns, cov_matrix, risk_free_rate)
+    
+    error = check_grad(negative_sharpe_ratio, negative_sharpe_ratio_gradient, weights, *args)
+    assert error < 1e-6 * np.linalg.norm(negative_sharpe_ratio_gradient(weights, *args))
+
+
+def test_portfolio_volatility_hessian(portfolio):
+    weights, _, cov_matrix = portfolio
+    
+    # Finite differences of the (analytic) gradient, one column per weight
+    numeric_hessian = approx_fprime(weights, portfolio_volatility_gradient, 1e-7, cov_matrix)
+    hessian = portfolio_volatility_hessian(weights, cov_matrix)
+    
+    np.testing.assert_allclose(hessian, hessian.T)
+    np.testing.assert_allclose(numeric_hessian, hessian, rtol=1e-5, atol=1e-6 * np.abs(hessian).max())
+
+
+# When the risk-free rate is above every return the max Sharpe ratio problem is non-convex; 
+# the result should match the best portfolio on a fine grid of long-only weights
+@pytest.mark.parametrize('seed', range(40))
+def test_max_sharpe_ratio_below_risk_free_rate(seed):
+    rng = np.random.default_rng(seed)
+    factors = rng.normal(0, 0.1, (3, 3))
+    cov_matrix = factors @ factors.T + np.diag(rng.uniform(1e-3, 1e-2, 3))
+    mean_returns = rng.normal(0.05, 0.05, 3)
+    risk_free_rate = mean_returns.max() + 0.05
+    
+    weights = max_sharpe_ratio_portfolio(mean_returns, cov_matrix, risk_free_rate, 
+                                         weight_bounds(3, allow_shorting=False), seed=0)
+    
+    grid = np.linspace(0, 1, 201)
+    grid_weights = np.array([(a, b, 1 - a - b) for a in grid for b in grid if a + b <= 1])
+    grid_sharpe = ((grid_weights @ mean_returns - risk_free_rate) / 
+                   np.sqrt(np.einsum('ij,jk,ik->i', grid_weights, cov_matrix, grid_weights)))
+    
+    assert np.isclose(weights.sum(), 1) and np.all(weights >= -1e-9)
+    assert -negative_sharpe_ratio(weights, mean_returns, cov_matrix, risk_free_rate) >= grid_sharpe.max() - 1e-6
+
+
+# The random portfolio cloud depends only on the seed, not on how it is chunked
+def test_simulate_portfolios_seed(portfolio):
+    _, mean_returns, cov_matrix = portfolio
+    
+    first = simulate_portfolios(1000, mean_returns, cov_matrix, seed=7)
+    chunked = simulate_portfolios(1000, mean_returns, cov_matrix, chunk_size=64, seed=7)
+    other = simulate_portfolios(1000, mean_returns, cov_matrix, seed=8)
+    
+    for values, chunked_values in zip(first, chunked):
+        np.testing.assert_array_equal(values, chunked_values)
+    assert not np.array_equal(first[0], other[0])
+
+
+# The multistart search reports how many optimizations actually ran, also when it stops early
+def test_multistart_reports_num_starts(portfolio, monkeypatch):
+    _, mean_returns, cov_matrix = portfolio
+    
+    # Count the solves (in this process, so only with n_jobs=1)
+    solves = []
+    minimize = portfolio_optimizer.minimize
+    
+    def counting_minimize(*args, **kwargs):
+        solves.append(1)
+        return minimize(*args, **kwargs)
+    
+    monkeypatch.setattr(portfolio_optimizer, 'minimize', counting_minimize)
+    
+    *arrays, info = mean_variance_optimization(100, mean_returns, cov_matrix, seed=0)
+    assert info == {'num_starts': 100, 'stopped_early': False} and len(solves) == 100
+    assert all(len(array) == 100 for array in arrays)
+    
+    solves.clear()
+    *arrays, info = mean_variance_optimization(2000, mean_returns, cov_matrix, seed=0, patience=5)
+    assert info['stopped_early'] and info['num_starts'] == len(solves) < 2000
+    assert all(len(arrays[0]) == len(array) <= info['num_starts'] < len(array) + 5 for array in arrays)
+
+
+# With worker processes, the search returns the same starts and stops at the same point, and 
+# only the chunks already handed to the workers run past it
+def test_multistart_stops_workers_early(portfolio):
+    _, mean_returns, cov_matrix = portfolio
+    
+    *arrays, info = mean_variance_optimization(600, mean_returns, cov_matrix, seed=0, patience=5)
+    *parallel_arrays, parallel_info = mean_variance_optimization(600, mean_returns, cov_matrix, seed=0, 
+                                                                 patience=5, n_jobs=3)
+    for values, parallel_values in zip(arrays, parallel_arrays):
+        np.testing.assert_array_equal(values, parallel_values)
+    assert parallel_info['stopped_early']
+    assert info['num_starts'] <= parallel_info['num_starts'] <= info['num_starts'] + 2 * 5
@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import portfolio_optimizer
+from portfolio_optimizer import (RETURN_COLUMNS, create_returns_dataframe, moments_statistics, 
+                                 refresh_return_moments, universe_statistics)
+
+
+FREQUENCIES = {'daily': 'B', 'weekly': 'W-MON', 'monthly': 'MS'}
+
+
+# Period returns of two tickers in the long layout of the returns models (BBB starts later)
+def make_returns(interval, num_periods=60):
+    rng = np.random.default_rng(0)
+    date_col, return_col, _ = RETURN_COLUMNS[interval]
+    dates = pd.date_range('2020-01-01', periods=num_periods, freq=FREQUENCIES[interval])
+
+    returns_df = pd.concat([pd.DataFrame({date_col: dates, 'ticker': 'AAA', return_col: rng.normal(0.01, 0.05, num_periods)}),
+                            pd.DataFrame({date_col: dates[10:], 'ticker': 'BBB',
+                                          return_col: rng.normal(0.02, 0.08, num_periods - 10)})],
+                           ignore_index=True)
+
+    return returns_df
+
+
+# Serve the returns models from an in-memory table and keep the moments files in a temporary
+# directory
+@pytest.fixture
+def returns_table(monkeypatch, tmp_path):
+    table = {'reads': []}
+
+    def fake_read_prices(interval, tickers=None, start=None, columns=None, use_cache=True, returns=False):
+        table['reads'].append((tuple(tickers), start))
+        date_col = RETURN_COLUMNS[interval][0]
+        df = table['df']
+        df = df[df['ticker'].isin(tickers)]
+        if start is not None:
+            df = df[df[date_col] >= pd.Timestamp(start)]
+        return df[columns].reset_index(drop=True)
+
+    monkeypatch.setattr(portfolio_optimizer, 'read_prices', fake_read_prices)
+    monkeypatch.setattr(portfolio_optimizer, 'RETURN_MOMENTS_DIR', str(tmp_path))
+
+    return table
+
+
+# Mean returns and pairwise covariance matrix computed by pandas from the full table
+def pandas_statistics(returns_df, interval, tickers):
+    date_col, return_col, _ = RETURN_COLUMNS[interval]
+    returns = returns_df.pivot(index=date_col, columns='ticker', values=return_col)[tickers]
+
+    return returns.mean().to_numpy(), returns.cov().to_numpy()
+
+
+@pytest.mark.parametrize('interval', list(FREQUENCIES))
+def test_refresh_picks_up_revised_bars(returns_table, interval):
+    date_col, return_col, _ = RETURN_COLUMNS[interval]
+    tickers = ['AAA', 'BBB']
+    full_df = make_returns(interval)
+    dates = full_df[date_col].drop_duplicates().sort_values()
+
+    # Build the moments without the last three periods
+    returns_table['df'] = full_df[full_df[date_col] <= dates.iloc[-4]]
+    moments = refresh_return_moments(interval, tickers)
+    for actual, expected in zip(moments_statistics(moments, tickers),
+                                pandas_statistics(returns_table['df'], interval, tickers)):
+        np.testing.assert_allclose(actual, expected)
+
+    # Ingest the last three periods, which also revises the bar just before the latest stored
+    # one (re-downloaded within PRICE_OVERLAP_DAYS)
+    revised_df = full_df.copy()
+    revised = revised_df[date_col] == dates.iloc[-5]
+    revised_df.loc[revised, return_col] += 0.1
+    returns_table['df'] = revised_df
+
+    moments = refresh_return_moments(interval, tickers)
+    for actual, expected in zip(moments_statistics(moments, tickers),
+                                pandas_statistics(revised_df, interval, tickers)):
+        np.testing.assert_allclose(actual, expected)
+
+
+def test_tickers_without_returns_are_not_kept(returns_table):
+    returns_table['df'] = make_returns('monthly')
+    refresh_return_moments('monthly', ['AAA', 'BBB'])
+
+    # An unknown ticker is looked up on its own and is not persisted, so it does not cause the
+    # tracked tickers' full history to be read again on the next refresh
+    returns_table['reads'].clear()
+    assert refresh_return_moments('monthly', ['AAA', 'ZZZ'])['tickers'] == ['AAA', 'BBB']
+    assert refresh_return_moments('monthly', ['AAA'])['tickers'] == ['AAA', 'BBB']
+    assert all(start is not None for tickers, start in returns_table['reads'] if tickers != ('ZZZ',))
+
+
+# Tickers without returns (not ingested yet, or mistyped) are an error, not NaN statistics
+@pytest.mark.parametrize('join', ['inner', 'outer', 'pairwise'])
+def test_universe_statistics_rejects_tickers_without_returns(returns_table, monkeypatch, join):
+    monkeypatch.setattr(portfolio_optimizer, 'get_data_version', lambda interval, returns=False: 0)
+    portfolio_optimizer.clear_statistics_cache()
+    returns_table['df'] = make_returns('monthly')
+
+    with pytest.raises(ValueError, match='ZZZ'):
+        universe_statistics(['AAA', 'BBB', 'ZZZ'], 'monthly', join=join)
+
+    mean_returns, covariance_matrix = universe_statistics(['AAA', 'BBB'], 'monthly', join=join)
+    assert np.isfinite(mean_returns).all() and np.isfinite(covariance_matrix).all()
+
+
+@pytest.mark.parametrize('join', ['inner', 'outer'])
+def test_create_returns_dataframe_rejects_tickers_without_returns(join):
+    returns_df = make_returns('monthly')
+
+    with pytest.raises(ValueError, match='ZZZ'):
+        create_returns_dataframe(returns_df, ['AAA', 'ZZZ'], 'month_start_date', 'monthly_return', join=join)
@@ -0,0 +1,66 @@
+import pytest
+from moto import mock_aws
+
+import utils
+
+
+BUCKET = 'test-bucket'
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    # Fake credentials, so nothing can reach a real AWS account
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+
+    with mock_aws():
+        # The shared client and listings must not outlive the mock
+        utils._s3_client['client'] = None
+        utils.clear_s3_listing_cache()
+
+        client = utils.get_s3_client()
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+        utils._s3_client['client'] = None
+        utils.clear_s3_listing_cache()
+
+
+def test_get_s3_key():
+    key = utils.get_s3_key('stock-price', 'aaa', 'price', 'date,close\n', '20240101')
+
+    assert key.startswith('stock-price/api_20240101_aaa_price_') and key.endswith('.csv')
+    assert key == utils.get_s3_key('stock-price', 'aaa', 'price', 'date,close\n', '20240101')
+    assert key != utils.get_s3_key('stock-price', 'aaa', 'price', 'date,close\n1\n', '20240101')
+
+
+def test_push_to_s3(s3):
+    utils.push_to_s3('date,close\n', BUCKET, 'stock-price/a.csv')
+
+    body = s3.get_object(Bucket=BUCKET, Key='stock-price/a.csv')['Body'].read()
+    assert body == b'date,close\n'
+
+
+def test_pull_from_s3_paginates_within_prefix(s3):
+    price_keys = [f'stock-price/{i:04d}.csv' for i in range(1205)]
+    for key in price_keys + ['stock-info/a.csv']:
+        s3.put_object(Bucket=BUCKET, Key=key, Body=b'')
+
+    assert sorted(utils.pull_from_s3(BUCKET, 'stock-price/')) == price_keys
+    assert utils.pull_from_s3(BUCKET, 'stock-info/') == ['stock-info/a.csv']
+    assert len(utils.pull_from_s3(BUCKET)) == 1206
+
+
+def test_pull_from_s3_cache(s3):
+    assert utils.pull_from_s3(BUCKET, 'stock-price/') == []
+
+    # Keys pushed through push_to_s3 are added to the cached listings that cover them
+    utils.push_to_s3('', BUCKET, 'stock-price/a.csv')
+    utils.push_to_s3('', BUCKET, 'stock-info/a.csv')
+    assert utils.pull_from_s3(BUCKET, 'stock-price/') == ['stock-price/a.csv']
+
+    # Keys written by anything else only show up once the cache is bypassed
+    s3.put_object(Bucket=BUCKET, Key='stock-price/b.csv', Body=b'')
+    assert utils.pull_from_s3(BUCKET, 'stock-price/') == ['stock-price/a.csv']
+    assert utils.pull_from_s3(BUCKET, 'stock-price/', use_cache=False) == ['stock-price/a.csv', 'stock-price/b.csv']
@@ -9,13 +9,55 @@ subsequently storing it in an AWS S3 bucket for onward transmission to AWS RDS v
 import os
 import ssl
 import json
+import hashlib
+import time
 import boto3
 import psycopg2
+import tempfile
+import threading
 import subprocess
 import pandas as pd
+import pyarrow.parquet as pq
 import yfinance as yf
-from io import StringIO
+from io import BytesIO, StringIO
 from datetime import date
+from psycopg2 import sql
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from psycopg2.pool import ThreadedConnectionPool
+
+
+# Daily request quota of the FMP API and the file that tracks how much of it has been used 
+# today, so the quota is respected across ingestion runs and threads
+FMP_DAILY_REQUEST_LIMIT = int(os.environ.get('FMP_DAILY_REQUEST_LIMIT', 250))
+FMP_USAGE_PATH = os.environ.get('FMP_USAGE_PATH', 'fmp-usage.json')
+
+_fmp_usage_lock = threading.Lock()
+
+
+# Raised when today's FMP request quota has been used up
+class FMPQuotaError(RuntimeError):
+    pass
+
+
+# Reserve one FMP request from today's quota. Raises FMPQuotaError once the quota is used up.
+def reserve_fmp_request():
+    with _fmp_usage_lock:
+        today = str(date.today())
+        try:
+            with open(FMP_USAGE_PATH) as file:
+                usage = json.load(file)
+        except (OSError, ValueError):
+            usage = {}
+        if usage.get('date') != today:
+            usage = {'date': today, 'requests': 0}
+        
+        if usage['requests'] >= FMP_DAILY_REQUEST_LIMIT:
+            raise FMPQuotaError(f'The FMP daily quota of {FMP_DAILY_REQUEST_LIMIT} requests has been used up.')
+        
+        usage['requests'] += 1
+        with open(FMP_USAGE_PATH, 'w') as file:
+            json.dump(usage, file)
 
 
 def get_info(ticker):
@@ -36,26 +78,190 @@ def get_info(ticker):
     
     # Set URL with API key to retrieve company info
     url = os.environ.get('FMP_API_URL') + ticker + os.environ.get('FMP_API_KEY')
+    
+    # Count the request against the daily FMP quota before sending it
+    reserve_fmp_request()
 
     company_info = get_jsonparsed_data(url)
     
     return company_info
     
     
-def read_stock_database(interval='daily'):      
+# Build a SELECT for a price table that only returns the requested columns, and pushes the 
+# ticker, date and ingested_at filters down to the database (any filter left as None is not 
+# applied). ingested_since keeps the rows ingested at or after that time.
+def build_price_query(table, date_col, columns, tickers=None, start=None, end=None, ingested_since=None):
+    conditions = []
+    params = []
+    
+    if tickers is not None:
+        conditions.append(sql.SQL('ticker = ANY(%s)'))
+        params.append(list(tickers))
+    
+    if start is not None and end is not None:
+        conditions.append(sql.SQL('{} BETWEEN %s AND %s').format(sql.Identifier(date_col)))
+        params.extend([start, end])
+    elif start is not None:
+        conditions.append(sql.SQL('{} >= %s').format(sql.Identifier(date_col)))
+        params.append(start)
+    elif end is not None:
+        conditions.append(sql.SQL('{} <= %s').format(sql.Identifier(date_col)))
+        params.append(end)
+    
+    if ingested_since is not None:
+        conditions.append(sql.SQL('ingested_at >= %s'))
+        params.append(ingested_since)
+        
+    query = sql.SQL('SELECT {} FROM {}').format(sql.SQL(', ').join(map(sql.Identifier, columns)), 
+                                                sql.Identifier(table))
+    if conditions:
+        query = query + sql.SQL(' WHERE ') + sql.SQL(' AND ').join(conditions)
+        
+    return query, params
+
+
+# Run a query with COPY (...) TO STDOUT and parse the CSV stream straight into typed columns. 
+# This avoids building a Python tuple per row (fetchall) and a second typed copy (astype).
+def copy_query_to_dataframe(cur, query, params, columns, schema):
+    copy_query = 'COPY (' + cur.mogrify(query, params).decode() + ') TO STDOUT WITH CSV'
+    
+    buffer = BytesIO()
+    cur.copy_expert(copy_query, buffer)
+    buffer.seek(0)
+    
+    # Dates are parsed separately; every other column is read directly as its final type
+    date_cols = [col for col in columns if schema[col].startswith('datetime64')]
+    dtypes    = {col: schema[col] for col in columns if col not in date_cols}
+    
+    df = pd.read_csv(buffer, names=columns, dtype=dtypes, parse_dates=date_cols)
+    
+    return df.astype({col: schema[col] for col in date_cols})
+
+
+# Database connection parameters
+def database_config():
     # Connect to the PostgreSQL database in AWS RDS
-    conn = psycopg2.connect(
-        dbname   = os.environ.get('CLOUD_DBNAME'),
-        user     = os.environ.get('CLOUD_USER'),
-        password = os.environ.get('CLOUD_PASS'),
-        host     = os.environ.get('CLOUD_HOST'),
-        port     = os.environ.get('CLOUD_PORT'),  # Default PostgreSQL port       
-        connect_timeout = 30                      # Set timeout to 30 seconds
-    )
-
-    # Create a cursor object to execute queries
-    cur = conn.cursor()
+    return {
+                 'dbname': os.environ.get('CLOUD_DBNAME'),
+                   'user': os.environ.get('CLOUD_USER'),
+               'password': os.environ.get('CLOUD_PASS'),
+                   'host': os.environ.get('CLOUD_HOST'),
+                   'port': os.environ.get('CLOUD_PORT'),  # Default PostgreSQL port
+        'connect_timeout': 30,                            # Set timeout to 30 seconds
+    }
+
+
+# Size of the connection pool shared by all database reads in this process (including every 
+# Streamlit rerun), set with the DB_POOL_MIN_SIZE and DB_POOL_MAX_SIZE environment variables. 
+# Connections idle for longer than DB_POOL_HEALTH_CHECK seconds are checked before reuse.
+DB_POOL_MIN_SIZE     = int(os.environ.get('DB_POOL_MIN_SIZE', 1))
+DB_POOL_MAX_SIZE     = int(os.environ.get('DB_POOL_MAX_SIZE', 5))
+DB_POOL_HEALTH_CHECK = float(os.environ.get('DB_POOL_HEALTH_CHECK', 30))
+
+_db_pool = {'pool': None, 'slots': None, 'last_used': {}}
+_db_pool_lock = threading.Lock()
+_db_pool_metrics = {'checkouts': 0, 'total_wait_time': 0.0, 'max_wait_time': 0.0, 'reconnects': 0}
+
+
+# Create the shared connection pool on first use
+def get_connection_pool():
+    with _db_pool_lock:
+        if _db_pool['pool'] is None or _db_pool['pool'].closed:
+            _db_pool['pool']      = ThreadedConnectionPool(DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, **database_config())
+            _db_pool['slots']     = threading.BoundedSemaphore(DB_POOL_MAX_SIZE)
+            _db_pool['last_used'] = {}
+            
+    return _db_pool['pool']
+
+
+# Close every connection in the shared pool
+def close_connection_pool():
+    with _db_pool_lock:
+        if _db_pool['pool'] is not None and not _db_pool['pool'].closed:
+            _db_pool['pool'].closeall()
+        _db_pool['pool'] = None
+
+
+# Checkout wait time and reconnect counts for the shared connection pool
+def get_pool_metrics():
+    with _db_pool_lock:
+        metrics = dict(_db_pool_metrics)
+        
+    metrics['avg_wait_time'] = metrics['total_wait_time'] / max(metrics['checkouts'], 1)
+    return metrics
+
+
+# Check that a pooled connection is still usable
+def _connection_is_healthy(conn):
+    if conn.closed:
+        return False
     
+    # Only ping connections that have been idle for a while
+    if time.monotonic() - _db_pool['last_used'].get(id(conn), 0.0) < DB_POOL_HEALTH_CHECK:
+        return True
+    
+    try:
+        with conn.cursor() as cur:
+            cur.execute('SELECT 1')
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+# Check out a connection from the shared pool, waiting for a free one if all are in use. 
+# Any open transaction is rolled back when the connection is returned.
+@contextmanager
+def get_connection():
+    db_pool = get_connection_pool()
+    slots   = _db_pool['slots']
+    
+    # Wait for a free connection and record how long it took
+    wait_start = time.perf_counter()
+    slots.acquire()
+    wait_time = time.perf_counter() - wait_start
+    
+    with _db_pool_lock:
+        _db_pool_metrics['checkouts'] += 1
+        _db_pool_metrics['total_wait_time'] += wait_time
+        _db_pool_metrics['max_wait_time'] = max(_db_pool_metrics['max_wait_time'], wait_time)
+    
+    conn = None
+    try:
+        conn = db_pool.getconn()
+        
+        # Replace connections that were closed or dropped by the server
+        if not _connection_is_healthy(conn):
+            db_pool.putconn(conn, close=True)
+            conn = db_pool.getconn()
+            with _db_pool_lock:
+                _db_pool_metrics['reconnects'] += 1
+        
+        yield conn
+    finally:
+        if conn is not None:
+            if not conn.closed:
+                conn.rollback()
+                _db_pool['last_used'][id(conn)] = time.monotonic()
+            db_pool.putconn(conn, close=bool(conn.closed))
+        slots.release()
+
+
+# Time (in seconds) that the company info table is cached in-process. It changes rarely.
+COMPANY_INFO_CACHE_TTL = 3600
+_company_info_cache = {'info_df': None, 'loaded_at': 0.0}
+
+
+# Drop the cached company info so the next read comes from the database
+def clear_company_info_cache():
+    _company_info_cache['info_df']   = None
+    _company_info_cache['loaded_at'] = 0.0
+
+
+# Read the company info table. The whole table is small and changes rarely, so it is cached 
+# for COMPANY_INFO_CACHE_TTL seconds and filtered to the requested tickers in memory. When the 
+# cache is bypassed for some tickers, only their rows are read (and the cache is left as is).
+def read_company_info(tickers=None, use_cache=True):
     # Define schema for the company info DataFrame.
     info_schema = {
               'ticker': 'str',
@@ -71,11 +277,33 @@ def read_stock_database(interval='daily'):
     # Set column names for company info
     info_cols = ['ticker', 'company_name', 'exchange', 'ceo', 'sector', 'industry', 'market_cap', 'ingested_at']
 
-    # Query company info table, fetch all rows from the result set, and create DataFrame
-    cur.execute('SELECT * FROM company_info')
-    rows = cur.fetchall()
-    info_df = pd.DataFrame(rows, columns=info_cols).astype(info_schema)
+    if not use_cache and tickers is not None:
+        with get_connection() as conn, conn.cursor() as cur:
+            cur.execute('SELECT * FROM company_info WHERE ticker = ANY(%s)', (list(tickers),))
+            rows = cur.fetchall()
+        return pd.DataFrame(rows, columns=info_cols).astype(info_schema)
+    
+    cache_expired = time.monotonic() - _company_info_cache['loaded_at'] > COMPANY_INFO_CACHE_TTL
     
+    if not use_cache or _company_info_cache['info_df'] is None or cache_expired:
+        with get_connection() as conn, conn.cursor() as cur:
+            # Query company info table, fetch all rows from the result set, and create DataFrame
+            cur.execute('SELECT * FROM company_info')
+            rows = cur.fetchall()
+        info_df = pd.DataFrame(rows, columns=info_cols).astype(info_schema)
+        
+        _company_info_cache['info_df']   = info_df
+        _company_info_cache['loaded_at'] = time.monotonic()
+    
+    info_df = _company_info_cache['info_df']
+    if tickers is not None:
+        info_df = info_df[info_df['ticker'].isin(list(tickers))]
+        
+    return info_df.copy()
+
+
+# Table, date filter column, column names and schema of the price table for an interval
+def get_price_table(interval):
     if interval == 'daily':
         # Define schema for the stock price DataFrame.
         price_schema = {
@@ -92,8 +320,8 @@ def read_stock_database(interval='daily'):
         # Set column names for stock price data
         price_cols = ['date', 'ticker', 'open', 'high', 'low', 'close', 'volume', 'ingested_at']
         
-        # Query daily stock table, fetch all rows from the result set, and create DataFrame
-        cur.execute('SELECT * FROM daily_stock_data')
+        # Set daily stock table and the column used for date filters
+        table, date_col = 'daily_stock_data', 'date'
         
     elif interval == 'weekly':
         # Define schema for the stock price DataFrame.
@@ -108,15 +336,16 @@ def read_stock_database(interval='daily'):
                  'weekly_low': 'float64',
                'weekly_close': 'float64',
               'weekly_volume': 'int64',
+                'ingested_at': 'datetime64[ns]',
         }
         
         # Set column names for stock price data
         price_cols = ['week', 'week_start_date', 'week_end_date', 'days_in_week', 
                       'ticker', 'weekly_open', 'weekly_high', 'weekly_low', 
-                      'weekly_close', 'weekly_volume']
+                      'weekly_close', 'weekly_volume', 'ingested_at']
         
-        # Query weekly stock table, fetch all rows from the result set, and create DataFrame
-        cur.execute('SELECT * FROM company_stock__weekly_stock_data')
+        # Set weekly stock table and the column used for date filters
+        table, date_col = 'company_stock__weekly_stock_data', 'week_start_date'
 
     elif interval == 'monthly':
         # Define schema for the stock price DataFrame.
@@ -131,15 +360,16 @@ def read_stock_database(interval='daily'):
                  'monthly_low': 'float64',
                'monthly_close': 'float64',
               'monthly_volume': 'int64',
+                 'ingested_at': 'datetime64[ns]',
         }
         
         # Set column names for stock price data
         price_cols = ['month', 'month_start_date', 'month_end_date', 'days_in_month', 
                       'ticker', 'monthly_open', 'monthly_high', 'monthly_low', 
-                      'monthly_close', 'monthly_volume']
+                      'monthly_close', 'monthly_volume', 'ingested_at']
         
-        # Query weekly stock table
-        cur.execute('SELECT * FROM company_stock__monthly_stock_data')
+        # Set monthly stock table and the column used for date filters
+        table, date_col = 'company_stock__monthly_stock_data', 'month_start_date'
   
     elif interval == 'quarterly':
         # Define schema for the stock price DataFrame.
@@ -154,15 +384,16 @@ def read_stock_database(interval='daily'):
                  'quarterly_low': 'float64',
                'quarterly_close': 'float64',
               'quarterly_volume': 'int64',
+                   'ingested_at': 'datetime64[ns]',
         }
         
         # Set column names for stock price data
         price_cols = ['quarter', 'quarter_start_date', 'quarter_end_date', 'days_in_quarter', 
                       'ticker', 'quarterly_open', 'quarterly_high', 'quarterly_low', 
-                      'quarterly_close', 'quarterly_volume']
+                      'quarterly_close', 'quarterly_volume', 'ingested_at']
         
-        # Query weekly stock table
-        cur.execute('SELECT * FROM company_stock__quarterly_stock_data')    
+        # Set quarterly stock table and the column used for date filters
+        table, date_col = 'company_stock__quarterly_stock_data', 'quarter_start_date'
         
     elif interval == 'yearly':
         # Define schema for the stock price DataFrame.
@@ -177,30 +408,315 @@ def read_stock_database(interval='daily'):
                  'yearly_low': 'float64',
                'yearly_close': 'float64',
               'yearly_volume': 'int64',
+                'ingested_at': 'datetime64[ns]',
         }
         
         # Set column names for stock price data
         price_cols = ['year', 'year_start_date', 'year_end_date', 'days_in_year', 
                       'ticker', 'yearly_open', 'yearly_high', 'yearly_low', 
-                      'yearly_close', 'yearly_volume']
+                      'yearly_close', 'yearly_volume', 'ingested_at']
         
-        # Query weekly stock table
-        cur.execute('SELECT * FROM company_stock__yearly_stock_data')          
-  
-    # Fetch all rows from the result set, and create DataFrame
-    rows = cur.fetchall()
-    price_df = pd.DataFrame(rows, columns=price_cols).astype(price_schema)    
+        # Set yearly stock table and the column used for date filters
+        table, date_col = 'company_stock__yearly_stock_data', 'year_start_date'
+    else:
+        raise ValueError(f"Unknown interval '{interval}'. Expected 'daily', 'weekly', 'monthly', 'quarterly' or 'yearly'.")
         
-    # Close the cursor and connection
-    cur.close()
-    conn.close()
+    return table, date_col, price_cols, price_schema
+
+
+# Table, date filter column, column names and schema of the returns model for an interval. 
+# Returns are computed in the database by the company_stock__<interval>_stock_returns dbt 
+# models; the first period of each ticker has no return and is not included.
+def get_returns_table(interval):
+    date_col = get_price_table(interval)[1]
+    close_col = 'close' if interval == 'daily' else f'{interval}_close'
+    
+    # Define schema for the stock returns DataFrame.
+    returns_schema = {
+        date_col: 'datetime64[ns]',
+        'ticker': 'str',
+        f'previous_{close_col}': 'float64',
+        close_col: 'float64',
+        f'{interval}_return': 'float64',
+        'ingested_at': 'datetime64[ns]',
+    }
+    
+    # Set column names for stock returns data
+    returns_cols = list(returns_schema)
+    
+    # Set stock returns table
+    table = f'company_stock__{interval}_stock_returns'
+    
+    return table, date_col, returns_cols, returns_schema
+
+
+# Read stock prices for an interval from the database. Only the requested tickers, dates 
+# (start/end, inclusive) and price columns are read; by default everything is returned. 
+# method='copy' streams the rows with COPY; method='fetchall' uses a regular cursor fetch. 
+# use_cache=True reads through the local Parquet cache (see read_cached_prices). returns=True 
+# reads the period returns computed by the dbt returns models instead (see get_returns_table). 
+# ingested_since only reads rows ingested at or after that time (database reads only).
+def read_prices(interval='daily', tickers=None, start=None, end=None, columns=None, method='copy', 
+                use_cache=False, returns=False, ingested_since=None):
+    if use_cache:
+        return read_cached_prices(interval, tickers=tickers, start=start, end=end, columns=columns, 
+                                  returns=returns)
+    
+    table, date_col, price_cols, price_schema = get_returns_table(interval) if returns else get_price_table(interval)
+    
+    # Only select the requested columns
+    if columns is None:
+        columns = price_cols
+    elif set(columns) - set(price_cols):
+        raise ValueError(f'Unknown {interval} price columns: {sorted(set(columns) - set(price_cols))}')
+    
+    # Query the stock table and create DataFrame
+    query, params = build_price_query(table, date_col, columns, tickers, start, end, ingested_since)
+    
+    with get_connection() as conn, conn.cursor() as cur:
+        if method == 'copy':
+            price_df = copy_query_to_dataframe(cur, query, params, columns, price_schema)
+        else:
+            # Fetch all rows from the result set
+            cur.execute(query, params)
+            rows = cur.fetchall()
+            price_df = pd.DataFrame(rows, columns=columns).astype({col: price_schema[col] for col in columns})    
+    
+    return price_df
+
+
+# Latest stored date of each ticker's daily prices, i.e. the high-water mark that ingestion 
+# fetches new prices from. All tickers are looked up in one query; each lookup is a backward 
+# scan of the (ticker, date) primary key. Tickers without stored prices are left out.
+def read_latest_price_dates(tickers):
+    query = ('SELECT t.ticker, (SELECT max(p.date) FROM daily_stock_data p WHERE p.ticker = t.ticker) '
+             'FROM unnest(%s::text[]) AS t(ticker)')
+    
+    with get_connection() as conn, conn.cursor() as cur:
+        cur.execute(query, (list(tickers),))
+        rows = cur.fetchall()
+    
+    return {ticker: pd.Timestamp(latest_date) for ticker, latest_date in rows if latest_date is not None}
+
+
+# Version stamp of a price (or returns) table, used to invalidate caches built from it. It comes from the 
+# table statistics (no table scan) and changes whenever rows are inserted, updated or deleted, 
+# or the table is rebuilt (e.g. by dbt). PostgreSQL publishes the row counters within seconds 
+# of a commit, so callers that write data should also clear their caches explicitly.
+def get_data_version(interval='daily', returns=False):
+    table = get_returns_table(interval)[0] if returns else get_price_table(interval)[0]
+    
+    with get_connection() as conn, conn.cursor() as cur:
+        cur.execute('SELECT relid, n_tup_ins, n_tup_upd, n_tup_del FROM pg_stat_user_tables '
+                    'WHERE relname = %s', (table,))
+        row = cur.fetchone()
+        
+    return tuple(row) if row is not None else None
+
+
+# Directory of the local Parquet cache of the price tables (PRICE_CACHE_DIR environment variable)
+PRICE_CACHE_DIR = os.environ.get('PRICE_CACHE_DIR', 'price-cache')
+
+
+# Cache file of one ticker's rows of a price table
+def price_cache_path(table, ticker):
+    return os.path.join(PRICE_CACHE_DIR, table, f'ticker={ticker}.parquet')
+
+
+# Rows ingested up to this long before a cached partition's latest ingested_at are read again 
+# when the cache is refreshed. ingested_at is the start time of the ingesting transaction, so a 
+# row can be committed (and become visible) after rows with a later ingested_at.
+PRICE_CACHE_LOOKBACK = pd.Timedelta(hours=1)
+
+
+# Atomically replace a cache file with a DataFrame. The file is written to a temporary file of 
+# its own in the same directory first, so concurrent writers never share a temporary file and 
+# readers never see a partial file.
+def write_cache_file(df, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            df.to_parquet(file, index=False)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+# Latest ingested_at of a cache file, taken from the Parquet column statistics so that no rows 
+# are read. Returns None if the file does not exist, is empty or lacks some of the columns 
+# (e.g. it was written before ingested_at was cached), so that the partition is rebuilt.
+def cache_file_watermark(path, columns):
+    if not os.path.exists(path):
+        return None
+    
+    metadata = pq.read_metadata(path)
+    names = metadata.schema.names
+    if metadata.num_rows == 0 or set(columns) - set(names):
+        return None
+    
+    index = names.index('ingested_at')
+    statistics = [metadata.row_group(i).column(index).statistics for i in range(metadata.num_row_groups)]
+    if all(stats is not None and stats.has_min_max for stats in statistics):
+        return max(pd.Timestamp(stats.max) for stats in statistics)
+    
+    return pd.read_parquet(path, columns=['ingested_at'])['ingested_at'].max()
+
+
+# Read stock prices through a local Parquet cache, partitioned by table and ticker. When refresh 
+# is True, the rows ingested since the cached partitions' latest ingested_at (less 
+# PRICE_CACHE_LOOKBACK) are read from the database and merged into the cache on their date, so 
+# new and revised rows are picked up; a partition is only read in full when it has to be 
+# rewritten. Everything else is read from the memory-mapped cache files, with the start and end 
+# filters applied while reading. Takes the same filters as read_prices.
+def read_cached_prices(interval='daily', tickers=None, start=None, end=None, columns=None, refresh=True, 
+                       returns=False):
+    table, date_col, price_cols, price_schema = get_returns_table(interval) if returns else get_price_table(interval)
+    
+    # Only select the requested columns
+    if columns is None:
+        columns = price_cols
+    elif set(columns) - set(price_cols):
+        raise ValueError(f'Unknown {interval} price columns: {sorted(set(columns) - set(price_cols))}')
+    
+    if tickers is None:
+        tickers = read_company_info()['ticker'].tolist()
+    
+    # Watermark of each ticker's cached partition (None if it is not cached)
+    watermarks = {ticker: cache_file_watermark(price_cache_path(table, ticker), price_cols) for ticker in tickers}
+    cached_tickers = [ticker for ticker in tickers if watermarks[ticker] is not None]
+    
+    # Partitions rewritten by the refresh, which are already in memory
+    loaded_dfs = {}
+    
+    if refresh and tickers:
+        # Tickers that are not cached yet are read in full. The cached tickers are read in one 
+        # query from the earliest of their watermarks.
+        uncached_tickers = [ticker for ticker in tickers if watermarks[ticker] is None]
+        
+        new_dfs = []
+        if uncached_tickers:
+            new_dfs.append(read_prices(interval, tickers=uncached_tickers, returns=returns))
+        if cached_tickers:
+            ingested_since = min(watermarks[ticker] for ticker in cached_tickers) - PRICE_CACHE_LOOKBACK
+            new_dfs.append(read_prices(interval, tickers=cached_tickers, returns=returns, 
+                                       ingested_since=ingested_since))
+        
+        for ticker, ticker_new_df in pd.concat(new_dfs, ignore_index=True).groupby('ticker'):
+            path = price_cache_path(table, ticker)
+            if watermarks[ticker] is None:
+                cached_df = pd.DataFrame(columns=price_cols).astype(price_schema)
+            else:
+                # Skip the partitions the new rows do not change. Only cached rows ingested 
+                # since the same time can be identical to them.
+                recent_df = pd.read_parquet(path, memory_map=True, filters=[('ingested_at', '>=', ingested_since)])
+                if select_new_rows(ticker_new_df, recent_df, [date_col]).empty:
+                    continue
+                cached_df = pd.read_parquet(path, memory_map=True)
+            
+            # New rows replace the cached rows of the same date
+            loaded_dfs[ticker] = (pd.concat([cached_df, ticker_new_df], ignore_index=True)
+                                    .drop_duplicates(subset=[date_col], keep='last')
+                                    .sort_values(date_col, ignore_index=True))
+            write_cache_file(loaded_dfs[ticker], path)
+    
+    # Read the other partitions, only the rows within the dates
+    filters = []
+    if start is not None:
+        filters.append((date_col, '>=', pd.Timestamp(start)))
+    if end is not None:
+        filters.append((date_col, '<=', pd.Timestamp(end)))
+    
+    price_dfs = [pd.DataFrame(columns=price_cols).astype(price_schema)]
+    for ticker in tickers:
+        if ticker in loaded_dfs:
+            price_dfs.append(loaded_dfs[ticker])
+        elif watermarks[ticker] is not None:
+            price_dfs.append(pd.read_parquet(price_cache_path(table, ticker), memory_map=True, 
+                                             filters=filters or None))
+    price_df = pd.concat(price_dfs, ignore_index=True)
+    
+    if start is not None:
+        price_df = price_df[price_df[date_col] >= pd.Timestamp(start)]
+    if end is not None:
+        price_df = price_df[price_df[date_col] <= pd.Timestamp(end)]
+        
+    return price_df[columns].reset_index(drop=True)
+
+
+# Stream stock prices for an interval from the database in chunks of `chunksize` rows, using a 
+# server-side (named) cursor so that only one chunk is held in memory at a time. Takes the same 
+# filters as read_prices and yields typed DataFrames.
+def iter_prices(interval='daily', chunksize=100000, tickers=None, start=None, end=None, columns=None, 
+                returns=False):
+    table, date_col, price_cols, price_schema = get_returns_table(interval) if returns else get_price_table(interval)
+    
+    # Only select the requested columns
+    if columns is None:
+        columns = price_cols
+    elif set(columns) - set(price_cols):
+        raise ValueError(f'Unknown {interval} price columns: {sorted(set(columns) - set(price_cols))}')
+    
+    query, params = build_price_query(table, date_col, columns, tickers, start, end)
+    
+    # The connection goes back to the pool even if the caller stops iterating early. 
+    # A named cursor keeps the rows on the server until they are fetched.
+    with get_connection() as conn, conn.cursor(name=f'iter_prices_{interval}') as cur:
+        cur.itersize = chunksize
+        cur.execute(query, params)
+        
+        while True:
+            rows = cur.fetchmany(chunksize)
+            if not rows:
+                break
+            yield pd.DataFrame(rows, columns=columns).astype({col: price_schema[col] for col in columns})
+
+
+# Read company info and stock prices (or, with returns=True, stock returns) from the database 
+# (see read_company_info and read_prices)
+def read_stock_database(interval='daily', tickers=None, start=None, end=None, columns=None, returns=False):      
+    info_df  = read_company_info(tickers)
+    price_df = read_prices(interval, tickers=tickers, start=start, end=end, columns=columns, returns=returns)
     
     return info_df, price_df
 
 
+_s3_client = {'client': None}
+_s3_lock = threading.Lock()
+
+
+# Shared S3 client. boto3 clients are thread-safe once created, but creating them from the 
+# default session is not, so the client is created once under a lock.
+def get_s3_client():
+    with _s3_lock:
+        if _s3_client['client'] is None:
+            _s3_client['client'] = boto3.client('s3')
+        return _s3_client['client']
+
+
+# Time (in seconds) that S3 key listings are cached in-process
+S3_LISTING_CACHE_TTL = 300
+_s3_listing_cache = {}
+
+
+# Drop the cached S3 key listings so the next listing comes from the bucket
+def clear_s3_listing_cache():
+    with _s3_lock:
+        _s3_listing_cache.clear()
+
+
+# S3 key of a CSV file pushed during ingestion. The key ends with a hash of the file content 
+# rather than a counter, so unique keys are picked without listing the bucket, and pushing 
+# the same file again writes to the same key.
+def get_s3_key(folder, ticker, kind, content, date_today):
+    content_hash = hashlib.sha256(content.encode()).hexdigest()[:16]
+    return f'{folder}/api_{date_today}_{ticker}_{kind}_{content_hash}.csv'
+
+
 def push_to_s3(content, bucket, key):
-    # Initialize the S3 client
-    s3 = boto3.client('s3')
+    # Get the S3 client
+    s3 = get_s3_client()
     
     # Upload the file to AWS S3 bucket
     try:
@@ -209,25 +725,140 @@ def push_to_s3(content, bucket, key):
               f'File saved as: {key}.')
     except Exception as e:
         print(f'Upload failed: {e}')
+        return
+    
+    # Keep the cached listings that cover the new key up to date
+    with _s3_lock:
+        for (cached_bucket, prefix), listing in _s3_listing_cache.items():
+            if cached_bucket == bucket and key.startswith(prefix) and key not in listing['keys']:
+                listing['keys'].append(key)
         
         
-def pull_from_s3(bucket):
-    # Initialize the S3 client
-    s3 = boto3.client('s3')
+# List the keys under a prefix of the S3 bucket. All result pages are read (a single listing 
+# returns at most 1,000 keys) and the listing is cached for S3_LISTING_CACHE_TTL seconds.
+def pull_from_s3(bucket, prefix='', use_cache=True):
+    with _s3_lock:
+        listing = _s3_listing_cache.get((bucket, prefix))
+        if use_cache and listing is not None and time.monotonic() - listing['loaded_at'] <= S3_LISTING_CACHE_TTL:
+            return list(listing['keys'])
     
-    # List objects in the S3 bucket    
-    response = s3.list_objects_v2(Bucket=bucket)
+    # List objects in the S3 bucket, one page at a time
+    paginator = get_s3_client().get_paginator('list_objects_v2')
+    filenames = [obj['Key'] for page in paginator.paginate(Bucket=bucket, Prefix=prefix) 
+                 for obj in page.get('Contents', [])]
     
-    try:
-        # Extract filenames from the response
-        filenames = [obj['Key'] for obj in response['Contents']]
-    except KeyError:
-        filenames = []
+    with _s3_lock:
+        _s3_listing_cache[(bucket, prefix)] = {'keys': filenames, 'loaded_at': time.monotonic()}
 
-    return filenames
+    return list(filenames)
 
         
-def get_historical_stock_data(tickers):
+# Number of tickers downloaded and staged at the same time during ingestion
+INGEST_MAX_WORKERS = int(os.environ.get('INGEST_MAX_WORKERS', 8))
+
+
+# Number of tickers requested from yfinance in a single batched download
+YF_BATCH_SIZE = int(os.environ.get('YF_BATCH_SIZE', 50))
+
+# Number of days before a ticker's latest stored date that are downloaded again, so recent 
+# prices that were revised after they were ingested are picked up
+PRICE_OVERLAP_DAYS = int(os.environ.get('PRICE_OVERLAP_DAYS', 7))
+
+
+# Default downloader used during ingestion. Prices are downloaded from start when it is given, 
+# otherwise for the whole period. Any callable with the same signature that returns a frame 
+# shaped like yf.download's (price fields by ticker columns, dates as the index) can be passed 
+# in its place, e.g. a fake serving prices from local files in tests.
+def yfinance_download(tickers, period='10y', start=None):
+    window = {'period': period} if start is None else {'start': start}
+    return yf.download(tickers, **window, group_by='column', auto_adjust=False, 
+                       rounding=True, threads=True, progress=False)
+
+
+# Split a batched download into one price DataFrame per ticker with a single reshape of the 
+# (price field, ticker) columns into (date, ticker) rows. Tickers that came back without any 
+# prices are left out.
+def split_price_download(raw, tickers):
+    if not isinstance(raw.columns, pd.MultiIndex):
+        raw = raw.copy()
+        raw.columns = pd.MultiIndex.from_product([raw.columns, tickers])
+    
+    prices = raw.stack(level=1, future_stack=True).dropna(subset=['Close'])
+    if getattr(prices.index.levels[0], 'tz', None) is not None:
+        prices.index = prices.index.set_levels(prices.index.levels[0].tz_localize(None), level=0)
+    
+    prices.index.names = ['date', 'ticker']
+    prices = prices.reset_index()
+    prices.columns = [str(column).lower() for column in prices.columns]
+    prices['ticker'] = prices['ticker'].str.upper()
+    
+    return {ticker: price_df for ticker, price_df in prices.groupby('ticker', sort=False)}
+
+
+# Download the price history of every ticker in batches of batch_size. start_dates maps tickers 
+# to the date their download starts from; the other tickers get the whole period. Tickers with 
+# the same start date are batched together. Tickers missing from a batch are retried one at a 
+# time, up to retries more times with a growing pause in between.
+def download_prices(tickers, period='10y', start_dates=None, downloader=yfinance_download, 
+                    batch_size=YF_BATCH_SIZE, retries=2):
+    tickers = [ticker.upper() for ticker in tickers]
+    start_dates = start_dates or {}
+    price_dfs = {}
+    
+    # Group the tickers by the date their download starts from
+    ticker_groups = {}
+    for ticker in tickers:
+        ticker_groups.setdefault(start_dates.get(ticker), []).append(ticker)
+    
+    for start, group in ticker_groups.items():
+        for i in range(0, len(group), batch_size):
+            batch = group[i:i + batch_size]
+            try:
+                price_dfs.update(split_price_download(downloader(batch, period=period, start=start), batch))
+            except Exception as e:
+                print(f'Batch download of {len(batch)} tickers failed: {e}')
+    
+    for ticker in tickers:
+        attempt = 0
+        while ticker not in price_dfs and attempt < retries:
+            attempt += 1
+            time.sleep(attempt)
+            try:
+                price_dfs.update(split_price_download(
+                    downloader([ticker], period=period, start=start_dates.get(ticker)), [ticker]))
+            except Exception as e:
+                print(f'Download of {ticker} failed (attempt {attempt} of {retries}): {e}')
+    
+    return price_dfs
+
+
+# Rows of api_df that are not stored in db_df yet, or whose values differ from the stored row 
+# (e.g. revised prices). Rows are matched on key_cols through a hash index of the stored keys, 
+# so each row is looked up once instead of merging the frames on every column.
+def select_new_rows(api_df, db_df, key_cols):
+    if db_df.empty:
+        return api_df
+    
+    db_index = pd.MultiIndex.from_frame(db_df[key_cols])
+    positions = db_index.get_indexer(pd.MultiIndex.from_frame(api_df[key_cols]))
+    matched = positions != -1
+    
+    # Keep the rows without a stored match and the rows where any value changed
+    changed = ~matched
+    for col in api_df.columns.difference(key_cols):
+        stored = db_df[col].to_numpy()[positions]
+        current = api_df[col].to_numpy()
+        changed |= matched & ~((stored == current) | (pd.isna(stored) & pd.isna(current)))
+    
+    return api_df[changed]
+
+
+# Download the price history and company info of each ticker and stage the rows that are not in 
+# the database yet. Up to max_workers tickers are processed concurrently (max_workers=1 processes 
+# them one after another); FMP requests are counted against the daily quota (see get_info). Once 
+# the quota is used up, tickers already in the database still have their prices staged, and new 
+# tickers are skipped. Returns the skipped tickers.
+def get_historical_stock_data(tickers, max_workers=INGEST_MAX_WORKERS, downloader=yfinance_download):
     # Get today's date (yyyymmdd).
     date_today = str(date.today()).replace("-", "")
     
@@ -237,6 +868,9 @@ def get_historical_stock_data(tickers):
     except AttributeError:
         tickers_list = tickers
     
+    # Ticker symbols as they are stored in the database
+    db_tickers = [ticker.upper() for ticker in tickers_list]
+    
     # Create the final column format for the stock data.
     price_cols = ['date', 'ticker', 'open', 'high', 'low', 'close', 'volume']
     
@@ -244,15 +878,15 @@ def get_historical_stock_data(tickers):
     bucket = 's3-bucket-name-goes-here'
         
     try:
-        # Pull all company info and stock data from the database, then convert them into a DataFrame
-        info_df_db_all, price_df_db_all = read_stock_database()
+        # Pull the company info and the latest stored price date of the requested tickers from the database
+        info_df_db_all, latest_dates = read_company_info(db_tickers, use_cache=False), read_latest_price_dates(db_tickers)
         print('Successfully read data from the database.')
     except:
         print('Failed to read data from the database because it may not exist.\n'
               'Attempting to create database and tables now.')
         subprocess.run(['bash', 'db_init.sh'], check=True)
         print('Sucessfully created database and tables.')
-        info_df_db_all, price_df_db_all = read_stock_database()
+        info_df_db_all, latest_dates = read_company_info(db_tickers, use_cache=False), read_latest_price_dates(db_tickers)
     
     # Define schema for company info and stock price DataFrame.
     info_schema = {
@@ -277,68 +911,78 @@ def get_historical_stock_data(tickers):
     
     print('\n-------- PROCESS STARTED: SAVING FILES TO AWS S3 BUCKET --------\n')
 
-    for ticker in tickers_list:
-        # Get stock price and company info data (DataFrame).
+    # Download the price history of all tickers in batches up front; the tickers are then 
+    # staged from the downloaded frames. Tickers that already have prices in the database 
+    # are only downloaded from PRICE_OVERLAP_DAYS before their latest stored date.
+    start_dates = {ticker: (latest_date - pd.Timedelta(days=PRICE_OVERLAP_DAYS)).strftime('%Y-%m-%d') 
+                   for ticker, latest_date in latest_dates.items()}
+    price_dfs_api = download_prices(tickers_list, start_dates=start_dates, downloader=downloader)
+    
+    # Pull the stored prices of the requested tickers from the first downloaded date onwards 
+    # (older rows cannot match a download) and index the stored rows by ticker
+    price_df_db_all = read_prices(tickers=db_tickers, start=min(start_dates.values(), default=None))
+    price_df_db_all = price_df_db_all.drop('ingested_at', axis=1)
+    info_dfs_db = {ticker: info_df.drop('ingested_at', axis=1) 
+                   for ticker, info_df in info_df_db_all.groupby('ticker', sort=False)}
+    price_dfs_db = dict(list(price_df_db_all.groupby('ticker', sort=False)))
+
+    # Tickers that could not be staged because the FMP quota was used up
+    skipped_tickers = []
+
+    def stage_ticker(ticker):
+        # Get the downloaded stock prices and the company info data (DataFrame).
         ticker = ticker.lower()
-        price_df_api = yf.download(ticker, rounding=True, period='10y')
-        info = get_info(ticker)
-        
-        info_data = {
-                  'ticker': [info[0]['symbol']],
-            'company_name': [info[0]['companyName']],
-                'exchange': [info[0]['exchangeShortName']],
-                     'ceo': [info[0]['ceo']],
-                  'sector': [info[0]['sector']],
-                'industry': [info[0]['industry']],
-              'market_cap': [info[0]['mktCap']]
-        }
+        price_df_api = price_dfs_api.get(ticker.upper())
+        if price_df_api is None:
+            print(f'No stock price data was downloaded for {ticker.upper()}.')
+            price_df_api = pd.DataFrame(columns=price_cols)
         
-        info_df_api = pd.DataFrame(info_data).astype(info_schema)
-
-        # The Date column is initially set as the index column when pulling from 
-        # the yfinance API. This will move the current index (Date) into a 
-        # column and reset the index to the default integer index.
-        price_df_api.reset_index(inplace=True)
+        try:
+            info = get_info(ticker)
+        except FMPQuotaError as e:
+            # Without company info, only the prices of tickers already in the database can be 
+            # staged (the price tables reference company_info)
+            if ticker.upper() not in info_dfs_db:
+                print(f'Skipping {ticker.upper()}: {e}')
+                skipped_tickers.append(ticker.upper())
+                return
+            print(f'Not updating the company info of {ticker.upper()}: {e}')
+            info = None
         
-        # Removed the Adj Close column.
+        if info is None:
+            info_df_api = info_dfs_db[ticker.upper()]
+        else:
+            info_data = {
+                      'ticker': [info[0]['symbol']],
+                'company_name': [info[0]['companyName']],
+                    'exchange': [info[0]['exchangeShortName']],
+                         'ceo': [info[0]['ceo']],
+                      'sector': [info[0]['sector']],
+                    'industry': [info[0]['industry']],
+                  'market_cap': [info[0]['mktCap']]
+            }
+            
+            info_df_api = pd.DataFrame(info_data).astype(info_schema)
+
+        # Keep only the final columns, which also drops the Adj Close column.
         # Note: This column was removed because with each pull from the API, the 
         # value was different which caused issues when comparing files that 
         # should be identical.
-        price_df_api.drop('Adj Close', axis=1, inplace=True)
-
-        # Add new column with ticker symbol and rearrange columns to make 
-        # ticker the second column.
-        price_df_api['ticker'] = ticker.upper()
-        price_df_api.columns = price_df_api.columns.str.lower()
-        
-        price_df_api = price_df_api[price_cols]
+        price_df_api = price_df_api[price_cols].reset_index(drop=True)
         price_df_api = price_df_api.astype(price_schema)
         
         # Check to see if the ticker exists in the database
-        if any(info_df_db_all['ticker'] == ticker.upper()):
-            # If the ticker exists in the database, then filter to only show 
-            # data from that ticker and drop the 'ingested_at' column
+        if ticker.upper() in info_dfs_db:
+            # If the ticker exists in the database, then look up the 
+            # stored rows of that ticker
             print(f'{ticker.upper()} exists in the database. Retrieving data.')
-            info_df_db = info_df_db_all[info_df_db_all['ticker'] == ticker.upper()].drop('ingested_at', axis=1)
-            price_df_db = price_df_db_all[price_df_db_all['ticker'] == ticker.upper()].drop('ingested_at', axis=1)
-            
-            # Combine the ticker data from the database with the data pulled from 
-            # the API. Compare them to only include data that is not already stored 
-            # in the database.
-            info_df_merged = pd.merge(info_df_db, info_df_api, how='outer', indicator=True)
-            info_df_api_new = info_df_merged[info_df_merged['_merge'] == 'right_only'].drop('_merge', axis=1)
-            price_df_merged = pd.merge(price_df_db, price_df_api, how='outer', indicator=True)
-            price_df_api_new = price_df_merged[price_df_merged['_merge'] == 'right_only'].drop('_merge', axis=1)
+            info_df_db = info_dfs_db[ticker.upper()]
+            price_df_db = price_dfs_db.get(ticker.upper(), price_df_db_all.iloc[:0])
             
-            try:
-                # Search for duplicate dates in the price data
-                dup_date = price_df_merged[price_df_merged.duplicated(subset=['date'])]['date'].iloc[0]
-                
-                # If there's a duplicate date, then exclude that row
-                if dup_date:
-                    price_df_api_new = price_df_api_new[price_df_api_new['date'] != dup_date]
-            except:
-                None
+            # Compare the ticker data from the database with the data pulled from the 
+            # APIs on the (ticker, date) key to only include new and revised rows.
+            info_df_api_new = select_new_rows(info_df_api, info_df_db, ['ticker'])
+            price_df_api_new = select_new_rows(price_df_api, price_df_db, ['ticker', 'date'])
                 
         else:
             print(f'{ticker.upper()} does not exists in the database.')
@@ -349,25 +993,14 @@ def get_historical_stock_data(tickers):
         # push to the AWS S3 bucket.
         if info_df_api_new.size != 0:
 
-            # Create filename format for stock price data
-            counter = 0
-            info_filename = ('stock-info/' + 'api_' + date_today + '_' + ticker
-                              + '_info_' + str(counter) + '.csv')
-            
-            # Get all files in the AWS S3 bucket
-            s3_filenames = pull_from_s3(bucket)
-            
-            # If the filename already exists, create a unique filename
-            while info_filename in s3_filenames:
-                counter += 1
-                info_filename = ('stock-info/' + 'api_' + date_today + '_' + 
-                                  ticker + '_info_' + str(counter) + '.csv')
-                    
             # Convert DataFrame to CSV string
             csv_buffer = StringIO()
             info_df_api_new.to_csv(csv_buffer, index=False)
             csv_content = csv_buffer.getvalue()
             
+            # Create a unique filename from the ticker and the file content
+            info_filename = get_s3_key('stock-info', ticker, 'info', csv_content, date_today)
+            
             push_to_s3(csv_content, bucket, info_filename)
 
         else:
@@ -377,28 +1010,26 @@ def get_historical_stock_data(tickers):
         # push to the AWS S3 bucket.
         if price_df_api_new.size != 0:
 
-            # Create filename format for stock price data
-            counter = 0
-            price_filename = ('stock-price/' + 'api_' + date_today + '_' + ticker
-                              + '_price_' + str(counter) + '.csv')
-            
-            # Get all files in the AWS S3 bucket
-            s3_filenames = pull_from_s3(bucket)
-            
-            # If the filename already exists, create a unique filename
-            while price_filename in s3_filenames:
-                counter += 1
-                price_filename = ('stock-price/' + 'api_' + date_today + '_' + 
-                                  ticker + '_price_' + str(counter) + '.csv')
-                    
             # Convert DataFrame to CSV string
             csv_buffer = StringIO()
             price_df_api_new.to_csv(csv_buffer, index=False)
             csv_content = csv_buffer.getvalue()
             
+            # Create a unique filename from the ticker and the file content
+            price_filename = get_s3_key('stock-price', ticker, 'price', csv_content, date_today)
+            
             push_to_s3(csv_content, bucket, price_filename)
 
         else:
             print(f'There is no new stock price data for {ticker.upper()}.')
 
-    print('\n-------- PROCESS COMPLETED: SAVED FILES TO AWS S3 BUCKET --------\n')
\ No newline at end of file
+    # Download and stage the tickers, at most max_workers at a time
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(stage_ticker, tickers_list))
+    
+    # New company info may have been written, so drop the cached copy
+    clear_company_info_cache()
+
+    print('\n-------- PROCESS COMPLETED: SAVED FILES TO AWS S3 BUCKET --------\n')
+
+    return sorted(skipped_tickers)
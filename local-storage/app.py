@@ -9,7 +9,7 @@ import subprocess
 import pandas as pd
 import streamlit as st
 from utils import get_historical_stock_data
-from portfolio_optimizer import optimize
+from portfolio_optimizer import optimize, clear_statistics_cache, refresh_all_return_moments
 
 
 @st.cache_data 
@@ -38,11 +38,22 @@ def optimize_portfolio():
 def fetch():
     try:
         # Retrieve stock data 
-        get_historical_stock_data(tickers)
+        skipped_tickers = get_historical_stock_data(tickers)
+        
+        # Output a message for the tickers that could not be fetched within the FMP daily quota
+        if skipped_tickers:
+            st.write(f"<h7 style='color: orange;'>Skipped (FMP daily quota used up): {', '.join(skipped_tickers)}</h7>", 
+                     unsafe_allow_html=True)
         
         # Push data to the database
         subprocess.run(['bash', 'push_to_db.sh'], check=True)
 
+        # Drop cached return statistics built from the old data
+        clear_statistics_cache()
+
+        # Fold the new bars into the persisted return moments
+        refresh_all_return_moments()
+
         # Output a message if the database upload is successsful
         st.write("<h7 style='color: green;'>Database Upload Successful! :smile: :tada:</h7>", unsafe_allow_html=True) 
     except:
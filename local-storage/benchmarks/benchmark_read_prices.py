@@ -0,0 +1,65 @@
+"""
+File: benchmark_read_prices.py (local deployment)
+Description: Benchmarks read_prices with method='copy' (COPY ... TO STDOUT parsed straight into typed columns) 
+against method='fetchall' (regular cursor fetch). Reports the wall time and the tracemalloc peak of each method. 
+The database connection is taken from the same environment variables the application uses 
+(LOCAL_DBNAME, LOCAL_USER, LOCAL_PASS, LOCAL_HOST and LOCAL_PORT).
+
+Usage: python benchmarks/benchmark_read_prices.py [--interval daily] [--tickers AAPL,MSFT] [--repeat 3]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+
+# The application modules are imported by name from the local-storage directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import read_prices
+
+
+# Read the prices with one method, returning the number of rows, the best wall time (in 
+# seconds) over the repeats and the tracemalloc peak (in bytes) of a single read
+def benchmark_method(method, interval, tickers, repeat):
+    best_time = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        price_df = read_prices(interval, tickers=tickers, method=method)
+        best_time = min(best_time, time.perf_counter() - start)
+        del price_df
+    
+    # Memory is measured on a separate read, since tracing slows the read down
+    tracemalloc.start()
+    price_df = read_prices(interval, tickers=tickers, method=method)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    num_rows = len(price_df)
+    
+    return num_rows, best_time, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare read_prices(method='copy') with method='fetchall'.")
+    parser.add_argument('--interval', default='daily', 
+                        help="Price interval to read: daily, weekly, monthly, quarterly or yearly (default: daily)")
+    parser.add_argument('--tickers', default=None, 
+                        help='Comma-separated tickers to read (default: every ticker)')
+    parser.add_argument('--repeat', type=int, default=3, 
+                        help='Number of timed reads per method; the best time is reported (default: 3)')
+    args = parser.parse_args()
+    
+    tickers = args.tickers.split(',') if args.tickers else None
+    
+    # Warm up the connection pool (and the database cache) before timing
+    read_prices(args.interval, tickers=tickers)
+    
+    print(f'{"method":<10}{"rows":>12}{"best time (s)":>16}{"peak memory (MB)":>20}')
+    for method in ('copy', 'fetchall'):
+        num_rows, best_time, peak = benchmark_method(method, args.interval, tickers, args.repeat)
+        print(f'{method:<10}{num_rows:>12,}{best_time:>16.3f}{peak / 1024**2:>20.1f}')
+
+
+if __name__ == '__main__':
+    main()
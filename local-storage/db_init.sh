@@ -17,7 +17,10 @@ echo "PROCESS: Creating database and tables, if they do not exist"
 # Create database and tables, if it does not exist
 export PGPASSWORD=$LOCAL_PASS
 createdb -h $LOCAL_HOST -p $LOCAL_PORT -U $LOCAL_USER $LOCAL_DBNAME                   # Create 'company_stock' database
-psql -h $LOCAL_HOST -p $LOCAL_PORT -U $LOCAL_USER -d $LOCAL_DBNAME -f stock_data.sql  # Create 'company_info' and 'daily_stock_price' tables
+
+# Create 'company_info' and 'daily_stock_price' tables. Set PARTITION_BY_YEAR=on to partition the 
+# daily stock prices by year.
+psql -h $LOCAL_HOST -p $LOCAL_PORT -U $LOCAL_USER -d $LOCAL_DBNAME -f stock_data.sql -v partition_by_year=${PARTITION_BY_YEAR:-off}
 
 unset $LOCAL_PASS
 unset PGPASSWORD
@@ -0,0 +1,20 @@
+/*
+    Lower bound on ingested_at for the rows an incremental run picks up: the model's 
+    latest ingested_at less the ingested_at_lookback var. ingested_at is the start time 
+    of the ingesting transaction, so this also picks up the rows of a transaction that 
+    started before the last run but committed after it. Rows picked up twice are simply 
+    replaced through the delete+insert keys.
+
+    Models built before ingested_at was added have no watermark. Their first incremental 
+    run picks up every row, and on_schema_change adds the column, so existing deployments 
+    migrate without a --full-refresh.
+*/
+
+{% macro ingested_since() %}
+	{%- set columns = adapter.get_columns_in_relation(this) | map(attribute='name') | map('lower') | list -%}
+	{%- if 'ingested_at' in columns -%}
+		(select coalesce(max(ingested_at), '-infinity') - interval '{{ var("ingested_at_lookback") }}' from {{ this }})
+	{%- else -%}
+		'-infinity'::timestamp
+	{%- endif -%}
+{% endmacro %}
@@ -1,7 +1,16 @@
-{{ config(materialized='table') }}
+{{ config(materialized='incremental',
+          unique_key=['ticker', 'date'],
+          indexes=[{'columns': ['ticker', 'date'], 'unique': True},
+                   {'columns': ['ingested_at']}],
+          incremental_strategy='delete+insert',
+          on_schema_change='append_new_columns') }}
 
 with source_daily_stock_data as (
 	select * from {{ source('company_stock', 'daily_stock_data') }}
+	{% if is_incremental() %}
+	-- Only pick up the rows ingested since the last run
+	where ingested_at >= {{ ingested_since() }}
+	{% endif %}
 ),
 
 final as (
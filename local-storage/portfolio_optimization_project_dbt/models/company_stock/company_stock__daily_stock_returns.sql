@@ -0,0 +1,47 @@
+/*
+    Create a Common Table Expression (CTE) for getting the daily 
+    return of each ticker from its closing prices.
+*/
+
+{{ config(materialized='incremental',
+          unique_key=['ticker', 'date'],
+          indexes=[{'columns': ['ticker', 'date'], 'unique': True},
+                   {'columns': ['ingested_at']}],
+          incremental_strategy='delete+insert',
+          on_schema_change='append_new_columns') }}
+
+with daily_stock_data as (
+	select date,
+	       ticker,
+	       lag(close) over ticker_window as previous_close,
+	       close,
+	       greatest(ingested_at, lag(ingested_at) over ticker_window) as ingested_at
+	from {{ ref('company_stock__daily_stock_data') }}
+	{% if is_incremental() %}
+	-- Only recompute the tickers that have newly ingested daily rows
+	where ticker in (
+		select ticker
+		from {{ ref('company_stock__daily_stock_data') }}
+		where ingested_at >= {{ ingested_since() }}
+	)
+	{% endif %}
+	window ticker_window as (partition by ticker order by date)
+),
+
+final as (
+	select date,
+	       ticker,
+	       previous_close,
+	       close,
+	       (close / previous_close - 1)::double precision as daily_return,
+	       ingested_at
+	from daily_stock_data
+	-- The first trading day of each ticker has no previous close
+	where previous_close is not null
+	{% if is_incremental() %}
+	  -- Returns whose day or previous day changed
+	  and ingested_at >= {{ ingested_since() }}
+	{% endif %}
+)
+
+select * from final
@@ -0,0 +1,50 @@
+/*
+    Create a Common Table Expression (CTE) for getting the monthly 
+    return of each ticker from its closing prices.
+*/
+
+{{ config(materialized='incremental',
+          unique_key=['ticker', 'month_start_date'],
+          indexes=[{'columns': ['ticker', 'month_start_date'], 'unique': True},
+                   {'columns': ['ingested_at']}],
+          incremental_strategy='delete+insert',
+          on_schema_change='append_new_columns') }}
+
+with monthly_stock_data as (
+	select month_start_date,
+	       ticker,
+	       lag(month_start_date) over ticker_window as previous_month_start_date,
+	       lag(monthly_close) over ticker_window as previous_monthly_close,
+	       monthly_close,
+	       greatest(ingested_at, lag(ingested_at) over ticker_window) as ingested_at
+	from {{ ref('company_stock__monthly_stock_data') }}
+	{% if is_incremental() %}
+	-- Only recompute the tickers that have newly ingested monthly bars
+	where ticker in (
+		select ticker
+		from {{ ref('company_stock__monthly_stock_data') }}
+		where ingested_at >= {{ ingested_since() }}
+	)
+	{% endif %}
+	window ticker_window as (partition by ticker order by month_start_date)
+),
+
+final as (
+	select month_start_date,
+	       ticker,
+	       previous_monthly_close,
+	       monthly_close,
+	       (monthly_close / previous_monthly_close - 1)::double precision as monthly_return,
+	       ingested_at
+	from monthly_stock_data
+	-- The first month of each ticker has no previous close, and returns are only 
+	-- taken between consecutive months
+	where previous_monthly_close is not null
+	  and date_trunc('month', previous_month_start_date) = date_trunc('month', month_start_date) - interval '1 month'
+	{% if is_incremental() %}
+	  -- Returns whose month or previous month changed
+	  and ingested_at >= {{ ingested_since() }}
+	{% endif %}
+)
+
+select * from final
@@ -3,7 +3,12 @@
     average weekly stock price for each ticker.
 */
 
-{{ config(materialized='table') }}
+{{ config(materialized='incremental',
+          unique_key=['ticker', 'week_start_date'],
+          indexes=[{'columns': ['ticker', 'week_start_date'], 'unique': True},
+                   {'columns': ['ingested_at']}],
+          incremental_strategy='delete+insert',
+          on_schema_change='append_new_columns') }}
 
 with weekly_stock_data as (
 	select date_trunc('week', date)::date as weekly_date,
@@ -15,8 +20,17 @@ with weekly_stock_data as (
 		   avg(high) as weekly_high,	
 		   avg(low) as weekly_low,	
 		   avg(close) as weekly_close,
-	       sum(volume) as weekly_volume
+	       sum(volume) as weekly_volume,
+	       max(ingested_at) as ingested_at
 	from {{ ref('company_stock__daily_stock_data') }}
+	{% if is_incremental() %}
+	-- Only recompute the weeks of the tickers that have newly ingested daily rows
+	where (ticker, date_trunc('week', date)) in (
+		select ticker, date_trunc('week', date)
+		from {{ ref('company_stock__daily_stock_data') }}
+		where ingested_at >= {{ ingested_since() }}
+	)
+	{% endif %}
 	group by weekly_date,
 			 ticker
 	order by weekly_date,
@@ -33,7 +47,8 @@ final as (
 	   round(weekly_high::numeric, 3) as weekly_high,
 	   round(weekly_low::numeric, 3) as weekly_low,
 	   round(weekly_close::numeric, 3) as weekly_close,
-	   weekly_volume
+	   weekly_volume,
+	   ingested_at
 	from weekly_stock_data
 )
 
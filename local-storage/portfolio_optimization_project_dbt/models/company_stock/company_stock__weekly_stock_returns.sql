@@ -0,0 +1,50 @@
+/*
+    Create a Common Table Expression (CTE) for getting the weekly 
+    return of each ticker from its closing prices.
+*/
+
+{{ config(materialized='incremental',
+          unique_key=['ticker', 'week_start_date'],
+          indexes=[{'columns': ['ticker', 'week_start_date'], 'unique': True},
+                   {'columns': ['ingested_at']}],
+          incremental_strategy='delete+insert',
+          on_schema_change='append_new_columns') }}
+
+with weekly_stock_data as (
+	select week_start_date,
+	       ticker,
+	       lag(week_start_date) over ticker_window as previous_week_start_date,
+	       lag(weekly_close) over ticker_window as previous_weekly_close,
+	       weekly_close,
+	       greatest(ingested_at, lag(ingested_at) over ticker_window) as ingested_at
+	from {{ ref('company_stock__weekly_stock_data') }}
+	{% if is_incremental() %}
+	-- Only recompute the tickers that have newly ingested weekly bars
+	where ticker in (
+		select ticker
+		from {{ ref('company_stock__weekly_stock_data') }}
+		where ingested_at >= {{ ingested_since() }}
+	)
+	{% endif %}
+	window ticker_window as (partition by ticker order by week_start_date)
+),
+
+final as (
+	select week_start_date,
+	       ticker,
+	       previous_weekly_close,
+	       weekly_close,
+	       (weekly_close / previous_weekly_close - 1)::double precision as weekly_return,
+	       ingested_at
+	from weekly_stock_data
+	-- The first week of each ticker has no previous close, and returns are only 
+	-- taken between consecutive weeks
+	where previous_weekly_close is not null
+	  and date_trunc('week', previous_week_start_date) = date_trunc('week', week_start_date) - interval '1 week'
+	{% if is_incremental() %}
+	  -- Returns whose week or previous week changed
+	  and ingested_at >= {{ ingested_since() }}
+	{% endif %}
+)
+
+select * from final
@@ -3,7 +3,12 @@
     average yearly stock price for each ticker.
 */
 
-{{ config(materialized='table') }}
+{{ config(materialized='incremental',
+          unique_key=['ticker', 'year_start_date'],
+          indexes=[{'columns': ['ticker', 'year_start_date'], 'unique': True},
+                   {'columns': ['ingested_at']}],
+          incremental_strategy='delete+insert',
+          on_schema_change='append_new_columns') }}
 
 with yearly_stock_data as (
 	select date_trunc('year', date)::date as yearly_date,
@@ -15,8 +20,17 @@ with yearly_stock_data as (
 		   avg(high) as yearly_high,	
 		   avg(low) as yearly_low,	
 		   avg(close) as yearly_close,
-	       sum(volume) as yearly_volume
+	       sum(volume) as yearly_volume,
+	       max(ingested_at) as ingested_at
 	from {{ ref('company_stock__daily_stock_data') }}
+	{% if is_incremental() %}
+	-- Only recompute the years of the tickers that have newly ingested daily rows
+	where (ticker, date_trunc('year', date)) in (
+		select ticker, date_trunc('year', date)
+		from {{ ref('company_stock__daily_stock_data') }}
+		where ingested_at >= {{ ingested_since() }}
+	)
+	{% endif %}
 	group by yearly_date,
 			 ticker
 	order by yearly_date,
@@ -33,7 +47,8 @@ final as (
 		round(yearly_high::numeric, 3) as yearly_high,
 		round(yearly_low::numeric, 3) as yearly_low,
 		round(yearly_close::numeric, 3) as yearly_close,
-		yearly_volume
+		yearly_volume,
+		ingested_at
 	from yearly_stock_data
 )
 
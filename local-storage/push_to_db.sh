@@ -29,32 +29,38 @@ echo "PROCESS: Setting SQL commands for pushing data into the database"
 INFO_TABLE="company_info"
 PRICE_TABLE="daily_stock_data"
 
-INFO_NEW_ROW_SQL_CMD="\COPY $INFO_TABLE (ticker, company_name, exchange, ceo, sector, industry, market_cap) FROM stdin WITH CSV HEADER DELIMITER E',';"
-PRICE_NEW_ROW_SQL_CMD="\COPY $PRICE_TABLE (date, ticker, open, high, low, close, volume) FROM stdin WITH CSV HEADER DELIMITER E',';" 
+# Each file is copied into a temporary staging table and then upserted, so rows that already 
+# exist are updated through the primary keys instead of being inserted again
+INFO_STAGING_SQL_CMD="CREATE TEMP TABLE staged_info (LIKE $INFO_TABLE INCLUDING DEFAULTS);"
+INFO_NEW_ROW_SQL_CMD="\COPY staged_info (ticker, company_name, exchange, ceo, sector, industry, market_cap) FROM stdin WITH CSV HEADER DELIMITER E',';"
+INFO_UPSERT_SQL_CMD="INSERT INTO $INFO_TABLE (ticker, company_name, exchange, ceo, sector, industry, market_cap)
+                     SELECT DISTINCT ON (ticker) ticker, company_name, exchange, ceo, sector, industry, market_cap FROM staged_info
+                     ON CONFLICT (ticker) DO UPDATE SET
+                         company_name = EXCLUDED.company_name, exchange = EXCLUDED.exchange, ceo = EXCLUDED.ceo,
+                         sector = EXCLUDED.sector, industry = EXCLUDED.industry, market_cap = EXCLUDED.market_cap,
+                         ingested_at = CURRENT_TIMESTAMP;"
+
+# Existing price rows are only rewritten (and marked as newly ingested for the incremental 
+# dbt models) when their prices actually changed
+PRICE_STAGING_SQL_CMD="CREATE TEMP TABLE staged_prices (LIKE $PRICE_TABLE INCLUDING DEFAULTS);"
+PRICE_NEW_ROW_SQL_CMD="\COPY staged_prices (date, ticker, open, high, low, close, volume) FROM stdin WITH CSV HEADER DELIMITER E',';" 
+PRICE_UPSERT_SQL_CMD="INSERT INTO $PRICE_TABLE (date, ticker, open, high, low, close, volume)
+                      SELECT DISTINCT ON (ticker, date) date, ticker, open, high, low, close, volume FROM staged_prices
+                      ON CONFLICT (ticker, date) DO UPDATE SET
+                          open = EXCLUDED.open, high = EXCLUDED.high, low = EXCLUDED.low, close = EXCLUDED.close,
+                          volume = EXCLUDED.volume, ingested_at = CURRENT_TIMESTAMP
+                      WHERE ($PRICE_TABLE.open, $PRICE_TABLE.high, $PRICE_TABLE.low, $PRICE_TABLE.close, $PRICE_TABLE.volume)
+                            IS DISTINCT FROM (EXCLUDED.open, EXCLUDED.high, EXCLUDED.low, EXCLUDED.close, EXCLUDED.volume);"
 
 echo "PROCESS: Pushing data into the company_info table"
 # Iterate through the list of file names in the staging folder 
 # for company info data and push each file to the database.
 for file in "${info_filenames[@]}"; do
     if [ -f "$file" ]; then
-        # Read the CSV file line by line
         echo "Processing file: $file"
-        while IFS=, read -r ticker company_name exchange ceo sector industry market_cap; do
-            # Check if the primary key already exists in the database
-            QUERY="SELECT COUNT(*) FROM $INFO_TABLE WHERE ticker='$ticker';"
-            RESULT=$(psql -h $LOCAL_HOST -p $LOCAL_PORT -U $LOCAL_USER -d $LOCAL_DBNAME -t -c "$QUERY")
-        
-            # Extract the count from the result
-            COUNT=$(echo $RESULT | tr -d ' ')
-            
-            # If the primary key exists, update the corresponding row in the database
-            if [[ "$COUNT" -gt 0 ]]; then
-                TIMESTAMP=$(date +"%Y-%m-%d %H:%M:%S")
-                psql -h $LOCAL_HOST -p $LOCAL_PORT -U $LOCAL_USER -d $LOCAL_DBNAME -c "UPDATE $INFO_TABLE SET company_name='$company_name', exchange='$exchange', ceo='$ceo', sector='$sector', industry='$industry', market_cap=$market_cap, ingested_at='$TIMESTAMP' WHERE ticker='$ticker'"
-            fi
-        done < "$file"
-        # Push to company_info table in database
-        cat $file | psql -h $LOCAL_HOST -p $LOCAL_PORT -U $LOCAL_USER -d $LOCAL_DBNAME -c "$INFO_NEW_ROW_SQL_CMD"
+        # Upsert into company_info table in database
+        cat $file | psql -h $LOCAL_HOST -p $LOCAL_PORT -U $LOCAL_USER -d $LOCAL_DBNAME --single-transaction \
+            -c "$INFO_STAGING_SQL_CMD" -c "$INFO_NEW_ROW_SQL_CMD" -c "$INFO_UPSERT_SQL_CMD"
         echo "Moving $file from $info_staging to $info_archived"
         mv $file $info_archived   
     fi
@@ -66,8 +72,9 @@ echo "PROCESS: Pushing data into the daily_stock_data table"
 for file in "${price_filenames[@]}"; do
     if [ -f "$file" ]; then
         echo "Processing file: $file"
-        # Push to daily_stock_data table in database
-        cat $file | psql -h $LOCAL_HOST -p $LOCAL_PORT -U $LOCAL_USER -d $LOCAL_DBNAME -c "$PRICE_NEW_ROW_SQL_CMD" 
+        # Upsert into daily_stock_data table in database
+        cat $file | psql -h $LOCAL_HOST -p $LOCAL_PORT -U $LOCAL_USER -d $LOCAL_DBNAME --single-transaction \
+            -c "$PRICE_STAGING_SQL_CMD" -c "$PRICE_NEW_ROW_SQL_CMD" -c "$PRICE_UPSERT_SQL_CMD"
         echo "Moving $file to archived folder"
         mv $file $price_archived 
     fi
@@ -82,8 +89,8 @@ echo
 
 # Create and update dbt models in the database    
 cd portfolio_optimization_project_dbt  # Change to dbt project directory
-dbt clean                               # Delete the dbt_packages and target directories
-dbt run                                 # Run dbt models
+dbt run                                 # Run dbt models (incremental: only periods with new daily rows;
+                                        # models built before ingested_at was added are migrated in place)
 dbt test                                # Test models
 
 echo